@@ -1,7 +1,10 @@
+import functools
 import heapq
+import random
 
 import numpy as np
-import random
+
+from src.Board import as_board, COLORS, COLOR_CODES, EMPTY, BLACK, WHITE
 
 MAX_VALID_MOVES = 255
 
@@ -10,51 +13,41 @@ def in_bounds(r, c, max_r, max_c):
     return 0 <= r < max_r and 0 <= c < max_c
 
 
-def find_shared_border_cells(board, distance=1, max_valid_moves=MAX_VALID_MOVES):
-    # Ensure the input is a numpy array
-    if not isinstance(board, np.ndarray):
-        board = np.array(board)
+def border_offsets(distance=1):
+    """Relative positions checked around a cell: the 8 neighbours, plus the outer ring of 16 when distance is 2."""
+    offsets = [(-1, 0), (1, 0), (0, -1), (0, 1), (-1, -1), (-1, 1), (1, -1), (1, 1)]
+    if distance == 2:
+        offsets += [(-2, 0), (2, 0), (0, -2), (0, 2),
+                    (-2, -2), (-2, 2), (2, -2), (2, 2),
+                    (-2, -1), (-2, 1), (2, -1), (2, 1),
+                    (-1, -2), (-1, 2), (1, -2), (1, 2)]
+    return offsets
+
 
-    # Get the shape of the board
-    rows, cols = board.shape
+def find_shared_border_cells(board, distance=1, max_valid_moves=MAX_VALID_MOVES):
+    board = as_board(board)
+    size = board.size
+    cells = board.cells
+    offsets = border_offsets(distance)
 
     # Initialize list to store valid cells
     shared_border_cells = []
     none_cells = []
 
-    # Function to check if a position is within the board boundaries
-
     # Iterate over the entire board
-    for r in range(rows):
-        for c in range(cols):
-            # We're only interested in None cells
-            if board[r, c] is None:
+    for r in range(size):
+        for c in range(size):
+            # We're only interested in empty cells
+            if cells[r * size + c] == EMPTY:
                 has_neighbor = False
 
-                # Check all four neighbors (up, down, left, right)
-                neighbors = [
-                    (r - 1, c),  # Up
-                    (r + 1, c),  # Down
-                    (r, c - 1),  # Left
-                    (r, c + 1),  # Right
-                    (r - 1, c - 1),  # Top-left diagonal
-                    (r - 1, c + 1),  # Top-right diagonal
-                    (r + 1, c - 1),  # Bottom-left diagonal
-                    (r + 1, c + 1)  # Bottom-right diagonal
-                ]
-                if distance == 2:
-                    neighbors += [(r - 2, c), (r + 2, c), (r, c - 2), (r, c + 2),
-                                  (r - 2, c - 2), (r - 2, c + 2), (r + 2, c - 2), (r + 2, c + 2),
-                                  (r - 2, c - 1), (r - 2, c + 1), (r + 2, c - 1), (r + 2, c + 1),
-                                  (r - 1, c - 2), (r - 1, c + 2), (r + 1, c - 2), (r + 1, c + 2)]
-
-                for nr, nc in neighbors:
-                    if in_bounds(nr, nc, rows, cols):
-                        if board[nr, nc] is not None:
-                            has_neighbor = True
-                            break
-
-                # If this None cell has both Black and White as neighbors
+                for dr, dc in offsets:
+                    nr, nc = r + dr, c + dc
+                    if in_bounds(nr, nc, size, size) and cells[nr * size + nc] != EMPTY:
+                        has_neighbor = True
+                        break
+
+                # If this empty cell touches any stone
                 if has_neighbor:
                     shared_border_cells.append((r, c))
                 else:
@@ -99,7 +92,9 @@ def bounding_box_heuristic(board, buffer=1):
 
 
 def neighbors_heuristic(board):
-    n = len(board)
+    board = as_board(board)
+    n = board.size
+    cells = board.cells
     scores = [[0 for i in range(n)] for j in range(n)]
     empty_board = True
 
@@ -110,13 +105,13 @@ def neighbors_heuristic(board):
         for di, dj in directions:
             ni, nj = i + di, j + dj
             if 0 <= ni < n and 0 <= nj < n:
-                if board[ni][nj] is not None:
+                if cells[ni * n + nj] != EMPTY:
                     neighbors_sum += 1
         return neighbors_sum
 
     for i in range(n):
         for j in range(n):
-            if board[i][j] is None:
+            if cells[i * n + j] == EMPTY:
                 scores[i][j] = num_of_neighbors(i, j)
             else:
                 empty_board = False
@@ -124,24 +119,29 @@ def neighbors_heuristic(board):
     return scores, empty_board  # Return the found neighbors (could be less than k if there are fewer cells)
 
 
-def offensive_heuristic(board, color):
-    n = len(board)
+def sequence_heuristic(board, color):
+    """
+    Scores every empty cell by the runs of `color` stones it would join, 10 ** (run - 1) for each of the 4 directions.
+    """
+    board = as_board(board)
+    n = board.size
+    cells = board.cells
+    code = COLOR_CODES[color]
     scores = [[0 for i in range(n)] for j in range(n)]
 
     def sequence_found_in_direction(row, col, direction):
-        n = len(board)
         consec = 0  # Count the current empty cell we're testing
 
         # Check forward in the given direction
         i, j = row + direction[0], col + direction[1]
-        while 0 <= i < n and 0 <= j < n and board[i][j] == color:
+        while 0 <= i < n and 0 <= j < n and cells[i * n + j] == code:
             consec += 1
             i += direction[0]
             j += direction[1]
 
         # Check backward in the opposite direction
         i, j = row - direction[0], col - direction[1]
-        while 0 <= i < n and 0 <= j < n and board[i][j] == color:
+        while 0 <= i < n and 0 <= j < n and cells[i * n + j] == code:
             consec += 1
             i -= direction[0]
             j -= direction[1]
@@ -157,50 +157,19 @@ def offensive_heuristic(board, color):
 
     for i in range(n):
         for j in range(n):
-            if board[i][j] is None:
+            if cells[i * n + j] == EMPTY:
                 scores[i][j] = evaluate_position(i, j)
 
     return scores
 
 
-def defensive_heuristic(board, color):
-    n = len(board)
-    scores = [[0 for i in range(n)] for j in range(n)]
-    op_color = "black" if color == "white" else "white"
-
-    def sequence_found_in_direction(row, col, direction):
-        n = len(board)
-        consec = 0  # Count the current empty cell we're testing
-
-        # Check forward in the given direction
-        i, j = row + direction[0], col + direction[1]
-        while 0 <= i < n and 0 <= j < n and board[i][j] == op_color:
-            consec += 1
-            i += direction[0]
-            j += direction[1]
-
-        # Check backward in the opposite direction
-        i, j = row - direction[0], col - direction[1]
-        while 0 <= i < n and 0 <= j < n and board[i][j] == op_color:
-            consec += 1
-            i -= direction[0]
-            j -= direction[1]
-
-        return int(10 ** (consec - 1))
+def offensive_heuristic(board, color):
+    return sequence_heuristic(board, color)
 
-    def evaluate_position(row, col):
-        score = 0
-        directions = [(0, 1), (1, 0), (1, 1), (1, -1)]
-        for direction in directions:
-            score += sequence_found_in_direction(row, col, direction)
-        return score
 
-    for i in range(n):
-        for j in range(n):
-            if board[i][j] is None:
-                scores[i][j] = evaluate_position(i, j)
-
-    return scores
+def defensive_heuristic(board, color):
+    op_color = "black" if color == "white" else "white"
+    return sequence_heuristic(board, op_color)
 
 
 def get_top_k_moves(combined_scores, k):
@@ -223,26 +192,99 @@ def get_top_k_moves(combined_scores, k):
     return top_k_moves
 
 
-def mixed_heuristic(board, player_color, k):
-    n = len(board)
-
-    offensive_scores = offensive_heuristic(board, player_color)
-    defensive_scores = defensive_heuristic(board, player_color)
-    neighbor_scores, empty_board = neighbors_heuristic(board)
-    # bounding_box_scores = bounding_box_heuristic(board)
-
-    if empty_board:
-        return [(int(n / 2), int(n / 2))]
-
-    combined_scores = [[0 for i in range(n)] for j in range(n)]
-
-    for i in range(n):
-        for j in range(n):
-            combined_scores[i][j] = (offensive_scores[i][j] + defensive_scores[i][j]) * neighbor_scores[i][j]
-
-    relevant_moves = get_top_k_moves(combined_scores, k)
-
-    return relevant_moves
+# POW10[run] is the score of a direction where the empty cell joins `run` stones, int(10 ** (run - 1))
+POW10 = np.array([0] + [10 ** i for i in range(18)], dtype=np.int64)
+MAX_INT64_RUN = 14  # Longer runs could overflow the int64 sum of 2 colours * 4 directions * 8 neighbours
+
+
+def _run_lengths(padded, n, dr, dc):
+    """
+    For every cell, the number of consecutive stones starting at its neighbour in direction (dr, dc). `padded` is the
+    stone mask with an n wide False border, so every shifted view stays inside it.
+    """
+    run = np.zeros((n, n), dtype=np.int64)
+    alive = np.ones((n, n), dtype=bool)
+    for step in range(1, n):
+        r, c = n + dr * step, n + dc * step
+        alive &= padded[r:r + n, c:c + n]
+        if not alive.any():
+            break
+        run += alive
+    return run
+
+
+def sequence_scores(grid, code):
+    """Vectorized `sequence_heuristic` on an int8 grid of cell codes, as an int64 (or object for huge runs) array."""
+    n = grid.shape[0]
+    padded = np.zeros((3 * n, 3 * n), dtype=bool)
+    padded[n:2 * n, n:2 * n] = grid == code
+    runs = [_run_lengths(padded, n, dr, dc) + _run_lengths(padded, n, -dr, -dc)
+            for dr, dc in ((0, 1), (1, 0), (1, 1), (1, -1))]
+    if max(run.max() for run in runs) > MAX_INT64_RUN:
+        scores = sum(np.vectorize(lambda consec: int(10 ** (consec - 1)), otypes=[object])(run) for run in runs)
+    else:
+        scores = sum(POW10[run] for run in runs)
+    return np.where(grid == EMPTY, scores, 0)
+
+
+def neighbor_counts(grid):
+    """Vectorized `neighbors_heuristic`: occupied cells in the 3x3 square around every empty cell (a 3x3 convolution)."""
+    n = grid.shape[0]
+    padded = np.zeros((n + 2, n + 2), dtype=np.int64)
+    padded[1:-1, 1:-1] = grid != EMPTY
+    counts = sum(padded[1 + dr:n + 1 + dr, 1 + dc:n + 1 + dc] for dr, dc in border_offsets(1))
+    return np.where(grid == EMPTY, counts, 0)
+
+
+def mixed_heuristic(board, player_color, k, noise=True):
+    """
+    The k most promising empty cells for `player_color`: (offensive + defensive sequence score) * neighbour count,
+    best first. Same scores, noise and tie order as running the offensive / defensive / neighbors heuristics and
+    `get_top_k_moves`, computed with array operations.
+    """
+    return [move for move, _ in mixed_heuristic_scores(board, player_color, k, noise)]
+
+
+def mixed_heuristic_scores(board, player_color, k, noise=True):
+    """`mixed_heuristic` with the score of every move, as ((row, col), score) pairs."""
+    board = as_board(board)
+    n = board.size
+
+    if board.stones == 0:
+        return [((int(n / 2), int(n / 2)), 1)]
+
+    grid = board.to_array()
+    code = COLOR_CODES[player_color]
+    other = WHITE if code == BLACK else BLACK
+    combined = ((sequence_scores(grid, code) + sequence_scores(grid, other)) * neighbor_counts(grid)).ravel()
+
+    candidates = np.flatnonzero(combined > 0)  # Row-major, the order get_top_k_moves draws the noise in
+    if len(candidates) == 0:
+        return []
+    scores = combined[candidates].tolist()
+    if noise:
+        scores = [add_random_noise(score) for score in scores]
+
+    order = range(len(scores))
+    if len(scores) > k and combined.dtype != object:
+        values = -np.array(scores, dtype=np.float64)  # Noisy scores stay far below 2 ** 53, so floats are exact
+        kth = values[np.argpartition(values, k - 1)[:k]].max()
+        # argpartition picks any of the cells tied with the k-th score, the heap took them in row-major order
+        order = np.concatenate((np.flatnonzero(values < kth), np.flatnonzero(values == kth)))[:k].tolist()
+    chosen = sorted(order, key=lambda i: (-scores[i], i))[:k]
+    return [(divmod(int(candidates[i]), n), scores[i]) for i in chosen]
+
+
+def skip_move_noise(board):
+    """
+    Draws the random numbers `mixed_heuristic` spends on the noise of `board`, one per empty cell next to a stone,
+    without scoring the moves, so a search that does not need the moves keeps the draws of a seeded game.
+    """
+    board = as_board(board)
+    if board.stones == 0:
+        return
+    for _ in range(np.count_nonzero(neighbor_counts(board.to_array()))):
+        random.random()
 
 
 def print_2d_array(array, title):
@@ -262,27 +304,53 @@ def evaluation_function(board, current_color):
 
 
 def evaluation_state(state, current_color):
+    state = as_board(state)
     black_total_score = evaluate_color(state, "black", current_color) - \
                         evaluate_color(state, "white", current_color)
     return black_total_score if current_color == "black" else -1 * black_total_score
 
 
+@functools.lru_cache(maxsize=None)
+def evaluation_lines(size):
+    """
+    Cell indices of every line scored by `evaluate_color`: rows, columns, and the diagonals and anti-diagonals that
+    are at least 5 cells long, each ordered the same way np.diag / np.diag(np.fliplr) used to return them.
+    """
+    lines = []
+    for i in range(size):
+        lines.append(tuple(i * size + j for j in range(size)))  # Row i
+        lines.append(tuple(j * size + i for j in range(size)))  # Column i
+
+    for k in range(-size + 5, size - 4):
+        diagonal = [(r, r + k) for r in range(size) if 0 <= r + k < size]
+        lines.append(tuple(r * size + c for r, c in diagonal))
+        lines.append(tuple(r * size + (size - 1 - c) for r, c in diagonal))
+    return tuple(lines)
+
+
+@functools.lru_cache(maxsize=None)
+def evaluation_line_chunks(size):
+    """`evaluation_lines` split into consecutive chunks of at most LINE_CHUNK cells, the unit of the line tables."""
+    return tuple(tuple(line[i:i + LINE_CHUNK] for i in range(0, len(line), LINE_CHUNK))
+                 for line in evaluation_lines(size))
+
+
 def evaluate_color(board, color, current_color):
-    size = len(board)  # Assuming square board
-    current = color == current_color
+    board = as_board(board)
+    cells = board.cells
+    current_index = 0 if color == current_color else 1
+    tables = LINE_TABLES[COLOR_CODES[color]]
     evaluation = 0
 
-    # Evaluate rows and columns
-    for i in range(size):
-        # Evaluate row i
-        evaluation += evaluate_line([board[i][j] for j in range(size)], color, current)
-        # Evaluate column j
-        evaluation += evaluate_line([board[j][i] for j in range(size)], color, current)
-
-    # Evaluate diagonals
-    for i in range(-size + 5, size - 4):
-        evaluation += evaluate_line(np.diag(board, k=i), color, current)
-        evaluation += evaluate_line(np.diag(np.fliplr(board), k=i), color, current)
+    # Evaluate rows, columns and diagonals, one table lookup per chunk of every line
+    for chunks in evaluation_line_chunks(board.size):
+        codes = []
+        for chunk in chunks:
+            code = 0
+            for idx in reversed(chunk):
+                code = code * 3 + cells[idx]
+            codes.append(code)
+        evaluation += score_line_codes(codes, map(len, chunks), tables)[current_index]
     return evaluation
 
 
@@ -346,3 +414,345 @@ def calc(sequence, block_from_sides, is_current, has_empty_space=False):
             score *= 0.1
     return int(score)
 
+
+
+# Precomputed line scoring.
+#
+# evaluate_line is a left-to-right state machine over (consec, block_count, empty). Deciding whether an empty cell
+# bridges two runs looks one cell ahead, so the table version defers that decision with a `pending` flag instead.
+# consec is capped at 5 since calc scores every run of 5 or more the same. This gives 48 states, and for every state
+# and every chunk of up to LINE_CHUNK cells (encoded in base 3 with the board's cell codes) the tables hold the state
+# after the chunk and the score it adds, with is_current and without. check_line_tables compares the tables with
+# evaluate_line on every possible line up to a given length.
+
+LINE_CHUNK = 5
+LINE_STATES = 48
+_OWN, _NONE, _OPPONENT = 'own', None, 'opponent'
+
+
+def _encode_line_state(consec, block_count, empty, pending):
+    return ((consec * 2 + block_count - 1) * 2 + empty) * 2 + pending
+
+
+def _decode_line_state(state):
+    return state // 8, (state // 4) % 2 + 1, bool((state // 2) % 2), bool(state % 2)
+
+
+def _line_step(state, value):
+    """One cell of evaluate_line. Returns the next state and the scores added (current, not current)."""
+    consec, block_count, empty, pending = _decode_line_state(state)
+    scores = [0, 0]
+
+    def add(sequence, block_from_sides, has_empty_space=False):
+        scores[0] += calc(sequence, block_from_sides, True, has_empty_space)
+        scores[1] += calc(sequence, block_from_sides, False, has_empty_space)
+
+    if pending:
+        pending = False
+        if value == _OWN:  # The empty cell bridges two runs
+            empty = True
+        else:
+            add(consec, block_count - 1, empty)
+            consec, block_count, empty = 0, 1, False
+
+    if value == _OWN:
+        consec = min(consec + 1, 5)
+    elif value is _NONE and consec > 0:
+        if not empty:
+            pending = True
+        else:
+            add(consec, block_count - 1, empty)
+            consec, block_count, empty = 0, 1, False
+    elif value is _NONE:
+        block_count = 1
+    elif consec > 0:
+        add(consec, block_count)
+        consec, block_count = 0, 2
+    else:
+        block_count = 2
+    return _encode_line_state(consec, block_count, empty, pending), scores[0], scores[1]
+
+
+def _line_flush(state):
+    """The scores evaluate_line adds after its last cell."""
+    consec, block_count, empty, pending = _decode_line_state(state)
+    if pending:
+        return calc(consec, block_count - 1, True, empty), calc(consec, block_count - 1, False, empty)
+    if consec > 0:
+        return calc(consec, block_count, True), calc(consec, block_count, False)
+    return 0, 0
+
+
+def build_line_tables():
+    """
+    Returns {colour code: {chunk length: (next states, current scores, not current scores)}}, each list indexed by
+    state * 3 ** length + chunk code, plus the flush scores per state.
+    """
+    steps = [{value: _line_step(state, value) for value in (_OWN, _NONE, _OPPONENT)} for state in range(LINE_STATES)]
+    flush = [_line_flush(state) for state in range(LINE_STATES)]
+    symbols = {BLACK: (_NONE, _OWN, _OPPONENT), WHITE: (_NONE, _OPPONENT, _OWN)}  # Cell code -> value for the colour
+
+    tables = {}
+    for color_code, symbol_of in symbols.items():
+        tables[color_code] = {}
+        for length in range(1, LINE_CHUNK + 1):
+            n_codes = 3 ** length
+            next_states, current_scores, other_scores = [], [], []
+            for state in range(LINE_STATES):
+                for code in range(n_codes):
+                    current_state, current_score, other_score = state, 0, 0
+                    for _ in range(length):
+                        current_state, added_current, added_other = steps[current_state][symbol_of[code % 3]]
+                        current_score += added_current
+                        other_score += added_other
+                        code //= 3
+                    next_states.append(current_state)
+                    current_scores.append(current_score)
+                    other_scores.append(other_score)
+            tables[color_code][length] = (next_states, current_scores, other_scores, n_codes)
+    return tables, flush
+
+
+LINE_TABLES, LINE_FLUSH = build_line_tables()
+LINE_START_STATE = _encode_line_state(0, 2, False, False)
+
+
+def score_line_codes(codes, lengths, tables):
+    """
+    Scores one line from the base-3 codes of its chunks (first cell in the lowest digit), their lengths and the
+    tables of a colour. Returns (score when the colour is current, score when it is not), as evaluate_line would.
+    """
+    state = LINE_START_STATE
+    current = other = 0
+    for code, length in zip(codes, lengths):
+        next_states, current_scores, other_scores, n_codes = tables[length]
+        index = state * n_codes + code
+        state = next_states[index]
+        current += current_scores[index]
+        other += other_scores[index]
+    current_flush, other_flush = LINE_FLUSH[state]
+    return current + current_flush, other + other_flush
+
+
+@functools.lru_cache(maxsize=None)
+def batch_line_arrays(size):
+    """
+    The evaluation line chunks of a board and the line tables as NumPy arrays, for `evaluation_states`.
+
+    Every line is padded to the same number of chunks with empty chunks of length 0, whose table keeps the state
+    and scores nothing. The tables of all lengths are concatenated, the chunk of (line, position) is looked up at
+    `table_base + state * n_codes + code`.
+    """
+    chunks = evaluation_line_chunks(size)
+    width = max(len(line_chunks) for line_chunks in chunks)
+    cell_index = np.zeros((len(chunks), width, LINE_CHUNK), dtype=np.int64)
+    weights = np.zeros((len(chunks), width, LINE_CHUNK), dtype=np.int64)
+    table_base = np.zeros((len(chunks), width), dtype=np.int64)
+    n_codes = np.ones((len(chunks), width), dtype=np.int64)
+
+    bases = {0: 0}
+    offset = LINE_STATES
+    for length in range(1, LINE_CHUNK + 1):
+        bases[length] = offset
+        offset += LINE_STATES * 3 ** length
+    for line_id, line_chunks in enumerate(chunks):
+        for position, chunk in enumerate(line_chunks):
+            cell_index[line_id, position, :len(chunk)] = chunk
+            weights[line_id, position, :len(chunk)] = [3 ** i for i in range(len(chunk))]
+            table_base[line_id, position] = bases[len(chunk)]
+            n_codes[line_id, position] = 3 ** len(chunk)
+
+    tables = {}
+    for color_code in (BLACK, WHITE):
+        next_states, current_scores, other_scores = list(range(LINE_STATES)), [0] * LINE_STATES, [0] * LINE_STATES
+        for length in range(1, LINE_CHUNK + 1):
+            length_next, length_current, length_other, _ = LINE_TABLES[color_code][length]
+            next_states += length_next
+            current_scores += length_current
+            other_scores += length_other
+        tables[color_code] = (np.array(next_states, dtype=np.int64), np.array(current_scores, dtype=np.int64),
+                              np.array(other_scores, dtype=np.int64))
+    flush = np.array(LINE_FLUSH, dtype=np.int64)
+    return cell_index, weights, table_base, n_codes, tables, flush
+
+
+def evaluation_states(boards, current_color):
+    """
+    `evaluation_state` of many boards at once, as an int64 array. `boards` is a sequence of boards or an
+    (N, size * size) array of cell codes, the boards are scored together with array operations instead of a Python
+    loop over the lines of each board.
+    """
+    if isinstance(boards, np.ndarray) and boards.ndim == 2:
+        cells = boards
+    else:
+        cells = np.array([as_board(board).cells for board in boards], dtype=np.int64)
+    if len(cells) == 0:
+        return np.zeros(0, dtype=np.int64)
+    size = int(round(cells.shape[1] ** 0.5))
+    cell_index, weights, table_base, n_codes, tables, flush = batch_line_arrays(size)
+    codes = (cells[:, cell_index] * weights).sum(axis=-1)  # (boards, lines, chunks)
+
+    scores = {}
+    for color_code in (BLACK, WHITE):
+        next_states, current_scores, other_scores = tables[color_code]
+        state = np.full(codes.shape[:2], LINE_START_STATE, dtype=np.int64)
+        current = np.zeros(codes.shape[:2], dtype=np.int64)
+        other = np.zeros(codes.shape[:2], dtype=np.int64)
+        for position in range(codes.shape[2]):
+            index = table_base[:, position] + state * n_codes[:, position] + codes[:, :, position]
+            current += current_scores[index]
+            other += other_scores[index]
+            state = next_states[index]
+        scores[color_code] = ((current + flush[state, 0]).sum(axis=1), (other + flush[state, 1]).sum(axis=1))
+
+    if current_color == "black":
+        return scores[BLACK][0] - scores[WHITE][1]
+    return scores[WHITE][0] - scores[BLACK][1]
+
+
+def evaluation_function_batch(boards, current_color):
+    """`evaluation_function` of many boards, the scores of `evaluation_states` with noise, in board order."""
+    return [add_random_noise(int(score)) for score in evaluation_states(boards, current_color)]
+
+
+# JOINT_STEPS[colour code][own state * LINE_STATES + opponent state][cell code]: one cell for the automata of the
+# colour and of its opponent together, (next joint state, current score of the colour - not current score of the
+# opponent), the share of the cell in `evaluation_state` for the colour
+def _joint_steps(color_code):
+    symbols = (_NONE, _OWN, _OPPONENT) if color_code == BLACK else (_NONE, _OPPONENT, _OWN)
+    other_symbols = (_NONE, _OPPONENT, _OWN) if color_code == BLACK else (_NONE, _OWN, _OPPONENT)
+    steps = []
+    for own_state in range(LINE_STATES):
+        for other_state in range(LINE_STATES):
+            joint = []
+            for symbol, other_symbol in zip(symbols, other_symbols):
+                next_own, own_score, _ = _line_step(own_state, symbol)
+                next_other, _, other_score = _line_step(other_state, other_symbol)
+                joint.append((next_own * LINE_STATES + next_other, own_score - other_score))
+            steps.append(joint)
+    return steps
+
+
+JOINT_STEPS = {BLACK: _joint_steps(BLACK), WHITE: _joint_steps(WHITE)}
+JOINT_FLUSH = [LINE_FLUSH[own_state][0] - LINE_FLUSH[other_state][1]
+               for own_state in range(LINE_STATES) for other_state in range(LINE_STATES)]
+
+
+@functools.lru_cache(maxsize=1 << 16)
+def line_value_changes(cells, color_code, own_stones, other_stones):
+    """
+    How far the share of one line in `evaluation_state` for `color_code` (the current score of its runs minus the not
+    current score of the opponent's) can move when stones are added on its empty cells, `cells` being its cell codes.
+    Returns ((own, other, lowest change, highest change), ...) for every count of at most `own` stones of the colour
+    and `other` of the opponent that adds any, up to `own_stones` and `other_stones`. Both automata of evaluate_line
+    read the same cells, so this is a search over their joint states.
+    """
+    steps = JOINT_STEPS[color_code]
+    other_code = WHITE if color_code == BLACK else BLACK
+    start = LINE_START_STATE * LINE_STATES + LINE_START_STATE
+    reachable = {(0, 0): {start: (0, 0)}}  # Stones added -> joint state -> (lowest, highest) score so far
+    for code in cells:
+        if code == EMPTY:
+            choices = ((EMPTY, 0, 0), (color_code, 1, 0), (other_code, 0, 1))
+        else:
+            choices = ((code, 0, 0),)
+        following = {}
+        for (own, other), states in reachable.items():
+            for value, own_added, other_added in choices:
+                count = (own + own_added, other + other_added)
+                if count[0] > own_stones or count[1] > other_stones:
+                    continue
+                targets = following.setdefault(count, {})
+                for state, (low, high) in states.items():
+                    next_state, added = steps[state][value]
+                    old = targets.get(next_state)
+                    if old is None:
+                        targets[next_state] = (low + added, high + added)
+                    else:
+                        targets[next_state] = (min(old[0], low + added), max(old[1], high + added))
+        reachable = following
+
+    values = {}
+    for count, states in reachable.items():
+        values[count] = (min(low + JOINT_FLUSH[state] for state, (low, _) in states.items()),
+                         max(high + JOINT_FLUSH[state] for state, (_, high) in states.items()))
+    current = values[0, 0][0]
+    changes = []
+    for own in range(own_stones + 1):
+        for other in range(other_stones + 1):
+            counts = [values[count] for count in values if count[0] <= own and count[1] <= other]
+            if own or other:
+                changes.append((own, other, min(low for low, _ in counts) - current,
+                                max(high for _, high in counts) - current))
+    return tuple(changes)
+
+
+@functools.lru_cache(maxsize=None)
+def evaluation_line_directions(size):
+    """The `evaluation_lines` grouped by direction: rows, columns, diagonals and anti-diagonals."""
+    directions = {}
+    for line in evaluation_lines(size):
+        directions.setdefault(line[1] - line[0], []).append(line)
+    return tuple(tuple(lines) for lines in directions.values())
+
+
+def evaluation_change_bounds(board, current_color, own_stones, other_stones):
+    """
+    (lowest, highest) change of `evaluation_state(board, current_color)` when at most `own_stones` stones of
+    `current_color` and `other_stones` of the opponent are added. A stone lies on one line of every direction, so the
+    changes of the lines of a direction are added up over every way to share the stones between them.
+    """
+    board = as_board(board)
+    cells = board.cells
+    color_code = COLOR_CODES[current_color]
+    lowest = highest = 0
+    for lines in evaluation_line_directions(board.size):
+        totals = {(0, 0): (0, 0)}
+        for line in lines:
+            changes = line_value_changes(tuple([cells[idx] for idx in line]), color_code, own_stones, other_stones)
+            combined = dict(totals)  # No stone on this line
+            for (own, other), (low, high) in totals.items():
+                for own_added, other_added, change_low, change_high in changes:
+                    count = (own + own_added, other + other_added)
+                    if count[0] > own_stones or count[1] > other_stones:
+                        continue
+                    old = combined.get(count)
+                    if old is None:
+                        combined[count] = (low + change_low, high + change_high)
+                    else:
+                        combined[count] = (min(old[0], low + change_low), max(old[1], high + change_high))
+            totals = combined
+        lowest += min(low for low, _ in totals.values())
+        highest += max(high for _, high in totals.values())
+    return lowest, highest
+
+
+def encode_line(values):
+    """Chunk codes and lengths of a line given as 'black' / 'white' / None values."""
+    codes, lengths = [], []
+    for start in range(0, len(values), LINE_CHUNK):
+        chunk = values[start:start + LINE_CHUNK]
+        code = 0
+        for value in reversed(chunk):
+            code = code * 3 + COLOR_CODES[value]
+        codes.append(code)
+        lengths.append(len(chunk))
+    return codes, lengths
+
+
+def check_line_tables(max_length=10):
+    """
+    Exhaustive check of the line tables against evaluate_line: every line of 1 to `max_length` cells, both colours
+    and both values of `current`. Returns the number of lines checked, raises AssertionError on the first mismatch.
+    """
+    checked = 0
+    for length in range(1, max_length + 1):
+        for number in range(3 ** length):
+            values = [COLORS[(number // 3 ** i) % 3] for i in range(length)]
+            codes, lengths = encode_line(values)
+            for color_code in (BLACK, WHITE):
+                color = COLORS[color_code]
+                expected = evaluate_line(values, color, True), evaluate_line(values, color, False)
+                assert score_line_codes(codes, lengths, LINE_TABLES[color_code]) == expected, (values, color)
+            checked += 1
+    return checked
@@ -1,79 +1,365 @@
+import multiprocessing
+import random
+import time
+
 from src.Agents import AgentsUtils
+from src.Agents.IncrementalEvaluator import IncrementalEvaluator
+from src.Agents.MoveOrdering import MoveOrdering
+from src.Agents.ThreatSearch import create_threat_search, DEFAULT_MAX_NODES
+from src.Agents.TranspositionTable import TranspositionTable, EXACT, LOWER_BOUND, UPPER_BOUND, SIDE_TO_MOVE_KEY
 from src.Agents.agent import Agent
+from src.Board import as_board, Board, COLOR_CODES, opponent_code
+
+MAX_ITERATIVE_DEPTH = 32
+
+
+class _SearchTimeout(Exception):
+    """Raised inside the search when the time budget of the move is spent."""
+
+
+# Agent and shared alpha of a root-parallel search worker process, set once by _init_search_worker
+_worker_agent = None
+_worker_alpha = None
+
+
+def _init_search_worker(config, shared_alpha):
+    global _worker_agent, _worker_alpha
+    _worker_agent = AlphaBetaAgent(**config)
+    _worker_alpha = shared_alpha
+
+
+def _search_root_move(task):
+    cells, size, move, search_depth, move_number, time_left, seed = task
+    board = Board(size)
+    for idx, code in enumerate(cells):
+        if code:
+            board.make_move(idx // size, idx % size, code)
+    return _worker_agent.search_root_child(board, move, search_depth, move_number, time_left, seed, _worker_alpha)
 
 
 class AlphaBetaAgent(Agent):
-    def __init__(self, color, depth=1):
+    def __init__(self, color, depth=1, tt_bits=18, time_limit=None, max_depth=MAX_ITERATIVE_DEPTH, k=5,
+                 move_ordering=True, threat_search=None, threat_nodes=DEFAULT_MAX_NODES, workers=1, noise=True):
+        """
+        :param tt_bits: The transposition table holds 2 ** tt_bits entries, 0 disables it.
+        :param time_limit: Seconds per move. When set, `depth` is ignored and the agent deepens iteratively (up to
+                           `max_depth`) until the time is spent, then plays the move of the deepest completed search.
+        :param k: Moves searched per node, the top k of `mixed_heuristic`.
+        :param move_ordering: Reorders the moves of every node with killer moves and the history heuristic.
+        :param threat_search: 'vcf' or 'vct' looks for a forced win (within `threat_nodes` positions) before the
+                              regular search, None skips it.
+        :param workers: Processes of the root-parallel search, the root moves are split between them and the best
+                        root score is shared, so every worker cuts off against it. 1 searches in this process.
+        :param noise: False takes the `mixed_heuristic` moves without their random noise, the search is then the same
+                      on every run and in every worker.
+        """
         super().__init__()
         self.depth = depth
         self.color = color
+        self.time_limit = time_limit
+        self.max_depth = max_depth
+        self.search_depth = depth  # Depth of the search that is running
+        self.completed_depth = 0  # Deepest search completed for the last move
+        self.deadline = None
+        self.root_move = None  # Best move of the previous iteration, searched first at the root
+        self.k = k
+        self.noise = noise
+        self.ordering = MoveOrdering(max_ply=max(depth, max_depth) + 1) if move_ordering else None
+        # Search counters of the last move
+        self.nodes = 0  # Calls of alpha_beta
+        self.expanded = 0  # Nodes whose moves were searched
+        self.cutoffs = 0  # Expanded nodes that stopped early on a beta cutoff
+        self.first_move_cutoffs = 0  # Cutoffs caused by the first move searched
+        self.evaluator = None  # Tracks the working board during a search
+        # Kept across moves, positions searched on the previous turn are often reached again
+        self.transposition_table = TranspositionTable(tt_bits) if tt_bits else None
+        self.threat_search = create_threat_search(threat_search, threat_nodes)
+        self.workers = workers
+        # What a search worker needs to build its own copy of this agent
+        self.worker_config = {'color': color, 'depth': depth, 'tt_bits': tt_bits, 'max_depth': max_depth, 'k': k,
+                              'move_ordering': move_ordering, 'noise': noise}
+        self.shared_alpha = None  # Best root score found by any worker, during a parallel search
+        self.move_number = 0
+        self._pool = None
+        self._pool_alpha = None
+
+    def __getstate__(self):
+        # The worker pool stays with the process that created it
+        state = self.__dict__.copy()
+        state['_pool'] = state['_pool_alpha'] = None
+        return state
+
+    def close(self):
+        """Stops the worker processes of the parallel search."""
+        if self._pool is not None:
+            self._pool.terminate()
+            self._pool.join()
+            self._pool = self._pool_alpha = None
 
     def get_type(self):
         return 'alphabeta'
 
     def make_move(self, game_state):
-        return self.alpha_beta(0, game_state['board'], True, -float('inf'), float('inf'))[1]
+        if self.transposition_table is not None:
+            self.transposition_table.new_search()
+        # One working board per search, children are played and taken back on it with make/unmake
+        board = as_board(game_state['board']).copy()
+        if self.threat_search is not None:
+            winning_move = self.threat_search.find_win(board, self.color)
+            if winning_move is not None:
+                return winning_move
+        if self.ordering is not None:
+            if self.ordering.size != board.size:
+                self.ordering = MoveOrdering(board.size, len(self.ordering.killers))
+            self.ordering.new_search()
+        self.nodes = self.expanded = self.cutoffs = self.first_move_cutoffs = 0
+        self.move_number += 1
+        self.evaluator = IncrementalEvaluator(board)
+        try:
+            if self.time_limit is None:
+                self.search_depth = self.depth
+                self.completed_depth = self.depth
+                return self.search_root(board)[1]
+            return self.iterative_deepening(board)
+        finally:
+            self.evaluator = None
+            self.deadline = None
+            self.root_move = None
 
-    def alpha_beta(self, depth, board, maximizingPlayer, alpha, beta):
+    def iterative_deepening(self, board):
+        """
+        Searches depth 1, 2, ... until `time_limit` runs out and returns the move of the deepest completed search.
+        The first iteration always completes, so there is a move even when the budget is tiny.
+        """
+        start = time.perf_counter()
+        best_move = None
+        self.completed_depth = 0
+        for depth in range(1, self.max_depth + 1):
+            self.search_depth = depth
+            self.deadline = start + self.time_limit if depth > 1 else None
+            try:
+                best_move = self.search_root(board)[1]
+            except _SearchTimeout:
+                # The working board and evaluator are left mid-search, they are dropped with this move
+                break
+            self.completed_depth = depth
+            self.root_move = best_move
+            if time.perf_counter() - start >= self.time_limit:
+                break
+        return best_move
 
-        if depth >= self.depth:
+    def search_root(self, board):
+        """Returns (score, move) of the root, searched in the worker pool when there is more than one worker."""
+        if self.workers > 1 and self.search_depth > 1 and not multiprocessing.current_process().daemon:
+            return self.parallel_root_search(board)
+        return self.alpha_beta(0, board, True, -float('inf'), float('inf'))
+
+    def parallel_root_search(self, board):
+        """
+        Every root move is searched by a worker. A worker that finishes a move with a better score than the shared
+        alpha raises it, and all workers read it at every node, so later root moves are cut off like in the
+        sequential search. Only the scores that raised the shared alpha are exact, the best of them is played.
+        """
+        legal_moves = AgentsUtils.mixed_heuristic(board, self.color, self.k, self.noise)
+        if self._no_valid_moves(legal_moves):
             return self.evaluation_function(board), (-1, -1)
+        if self.root_move in legal_moves:
+            legal_moves.remove(self.root_move)
+            legal_moves.insert(0, self.root_move)
 
-        # legal_moves = [(i, j) for i in range(len(board)) for j in range(len(board[0])) if board[i][j] is None]
-        legal_moves = AgentsUtils.mixed_heuristic(board, self.color, 5)
+        pool, shared_alpha = self._get_pool()
+        shared_alpha.value = -float('inf')
+        time_left = None if self.deadline is None else max(0.0, self.deadline - time.perf_counter())
+        # Seeds drawn here keep the heuristic noise of the workers reproducible from this process' seed
+        tasks = [(board.cells, board.size, move, self.search_depth, self.move_number, time_left,
+                  random.getrandbits(32)) for move in legal_moves]
+
+        best_score, best_move = -float('inf'), legal_moves[0]
+        timed_out = False
+        for move, (score, improved, stats) in zip(legal_moves, pool.map(_search_root_move, tasks, chunksize=1)):
+            self.nodes += stats[0]
+            self.expanded += stats[1]
+            self.cutoffs += stats[2]
+            self.first_move_cutoffs += stats[3]
+            if score is None:
+                timed_out = True
+            elif improved and score > best_score:
+                best_score, best_move = score, move
+        if timed_out:
+            raise _SearchTimeout()
+        self.nodes += 1
+        self.expanded += 1
+        return best_score, best_move
+
+    def _get_pool(self):
+        if self._pool is None:
+            self._pool_alpha = multiprocessing.Value('d', -float('inf'))
+            self._pool = multiprocessing.Pool(processes=self.workers, initializer=_init_search_worker,
+                                              initargs=(self.worker_config, self._pool_alpha))
+        return self._pool, self._pool_alpha
+
+    def search_root_child(self, board, move, search_depth, move_number, time_left, seed, shared_alpha):
+        """
+        Worker side of `parallel_root_search`: searches the position after root move `move`.
+        Returns (score or None on timeout, whether the score raised the shared alpha, search counters).
+        """
+        random.seed(seed)
+        if move_number != self.move_number:
+            self.move_number = move_number
+            if self.transposition_table is not None:
+                self.transposition_table.new_search()
+            if self.ordering is not None:
+                self.ordering.new_search()
+        self.nodes = self.expanded = self.cutoffs = self.first_move_cutoffs = 0
+        self.search_depth = search_depth
+        self.deadline = None if time_left is None else time.perf_counter() + time_left
+        self.shared_alpha = shared_alpha
+        self.evaluator = IncrementalEvaluator(board)
+        try:
+            self._apply_move(board, move, self.color)
+            score = self.alpha_beta(1, board, False, shared_alpha.value, float('inf'))[0]
+            with shared_alpha.get_lock():
+                improved = score > shared_alpha.value
+                if improved:
+                    shared_alpha.value = score
+        except _SearchTimeout:
+            score, improved = None, False
+        finally:
+            self.evaluator = None
+            self.deadline = None
+            self.shared_alpha = None
+        return score, improved, (self.nodes, self.expanded, self.cutoffs, self.first_move_cutoffs)
+
+    def alpha_beta(self, depth, board, maximizingPlayer, alpha, beta):
+        if self.deadline is not None and time.perf_counter() >= self.deadline:
+            raise _SearchTimeout()
+        self.nodes += 1
+        if self.shared_alpha is not None:
+            # Any root move of another worker scoring above alpha makes the lower scores irrelevant here too
+            alpha = max(alpha, self.shared_alpha.value)
+
+        table = self.transposition_table
+        key = None
+        tt_move = None
+        if table is not None:
+            key = board.key if maximizingPlayer else board.key ^ SIDE_TO_MOVE_KEY
+            entry = table.probe(key)
+            if entry is not None:
+                _, entry_depth, bound, score, tt_move, _ = entry
+                # The root always searches, it has to return a move for this turn
+                if depth > 0 and entry_depth >= self.search_depth - depth:
+                    if bound == EXACT or (bound == LOWER_BOUND and score >= beta) or \
+                            (bound == UPPER_BOUND and score <= alpha):
+                        return score, tt_move
+
+        if depth >= self.search_depth:
+            return self._store(key, 0, EXACT, self.evaluation_function(board), (-1, -1))
+
+        # legal_moves = board.empty_cells()
+        legal_moves = AgentsUtils.mixed_heuristic(board, self.color, self.k, self.noise)
 
         if self._no_valid_moves(legal_moves):
-            return self.evaluation_function(board), (-1, -1)
+            return self._store(key, 0, EXACT, self.evaluation_function(board), (-1, -1))
 
+        # Search the best move of the stored entry (at the root, of the previous iteration) first, it is the most
+        # likely to cause a cutoff
+        if depth == 0 and self.root_move is not None:
+            tt_move = self.root_move
+        if self.ordering is not None:
+            legal_moves = self.ordering.order(legal_moves, depth, self._side_code(maximizingPlayer), tt_move)
+        elif tt_move in legal_moves:
+            legal_moves.remove(tt_move)
+            legal_moves.insert(0, tt_move)
+
+        self.expanded += 1
+        alpha_orig, beta_orig = alpha, beta
         if maximizingPlayer:
-            return self.max_evaluation_alpha_beta(depth, board, legal_moves, maximizingPlayer, alpha, beta)
+            result = self.max_evaluation_alpha_beta(depth, board, legal_moves, maximizingPlayer, alpha, beta)
 
         else:
-            return self.min_evaluation_alpha_beta(depth, board, legal_moves, maximizingPlayer, alpha, beta)
+            result = self.min_evaluation_alpha_beta(depth, board, legal_moves, maximizingPlayer, alpha, beta)
+
+        if table is not None:
+            if self.shared_alpha is not None:
+                # Children may have failed low against a shared alpha raised during the search
+                alpha_orig = max(alpha_orig, self.shared_alpha.value)
+            bound = UPPER_BOUND if result[0] <= alpha_orig else LOWER_BOUND if result[0] >= beta_orig else EXACT
+            self._store(key, self.search_depth - depth, bound, result[0], result[1])
+        return result
+
+    def _side_code(self, maximizingPlayer):
+        code = COLOR_CODES[self.color]
+        return code if maximizingPlayer else opponent_code(code)
+
+    def _cutoff(self, depth, action, maximizingPlayer, index):
+        self.cutoffs += 1
+        if index == 0:
+            self.first_move_cutoffs += 1
+        if self.ordering is not None:
+            self.ordering.record_cutoff(action, depth, self._side_code(maximizingPlayer), self.search_depth - depth)
+
+    def search_stats(self):
+        """Counters of the last move, to measure the move ordering."""
+        stats = {'nodes': self.nodes, 'expanded': self.expanded, 'cutoffs': self.cutoffs,
+                 'cutoff_rate': self.cutoffs / self.expanded if self.expanded else 0.0,
+                 'first_move_cutoff_rate': self.first_move_cutoffs / self.cutoffs if self.cutoffs else 0.0,
+                 'completed_depth': self.completed_depth}
+        if self.transposition_table is not None:
+            stats['tt'] = self.transposition_table.stats()
+        return stats
+
+    def _store(self, key, depth, bound, score, move):
+        if self.transposition_table is not None:
+            self.transposition_table.store(key, depth, bound, score, move)
+        return score, move
 
     def max_evaluation_alpha_beta(self, depth, board, legal_moves, maximizingPlayer, alpha, beta):
         max_eval = -float('inf')
         max_action = (-1, -1)
-        for action in legal_moves:
-            board_copy = [row[:] for row in board]
-            board_copy = self._apply_move(board_copy, action, self.color)
-
-            action_run = self.alpha_beta(depth + 1, board_copy, not maximizingPlayer, alpha, beta)
+        for index, action in enumerate(legal_moves):
+            self._apply_move(board, action, self.color)
+            action_run = self.alpha_beta(depth + 1, board, not maximizingPlayer, alpha, beta)
+            self._undo_move(board, action)
 
             if action_run[0] > max_eval:
                 max_eval = action_run[0]
                 max_action = action
             alpha = max(alpha, action_run[0])
             if beta <= alpha:
+                self._cutoff(depth, action, maximizingPlayer, index)
                 break
         return max_eval, max_action
 
     def min_evaluation_alpha_beta(self, depth, board, legal_moves, maximizingPlayer, alpha, beta):
         min_eval = float('inf')
         min_action = (-1, -1)
-        for action in legal_moves:
-            board_copy = [row[:] for row in board]
+        for index, action in enumerate(legal_moves):
             other_color = "white" if self.color == "black" else "black"
-            board_copy = self._apply_move(board_copy, action, other_color)
-
-            action_run = self.alpha_beta(depth + 1, board_copy, not maximizingPlayer, alpha, beta)
+            self._apply_move(board, action, other_color)
+            action_run = self.alpha_beta(depth + 1, board, not maximizingPlayer, alpha, beta)
+            self._undo_move(board, action)
 
             if action_run[0] < min_eval:
                 min_eval = action_run[0]
                 min_action = action
             beta = min(beta, action_run[0])
             if beta <= alpha:
+                self._cutoff(depth, action, maximizingPlayer, index)
                 break
         return min_eval, min_action
 
     def _apply_move(self, board, move, symbol):
         r, c = move
-        board[r][c] = symbol
+        board.make_move(r, c, symbol)
+        if self.evaluator is not None:
+            self.evaluator.push(r, c, symbol)
         return board
 
     def _undo_move(self, board, move):
         r, c = move
-        board[r][c] = None
+        board.undo_move(r, c)
+        if self.evaluator is not None:
+            self.evaluator.pop()
 
     def _is_winner(self, board, symbol):
         def check_line(r, c, dr, dc):
@@ -82,15 +368,15 @@ class AlphaBetaAgent(Agent):
             for i in range(5):
                 nr = r + i * dr
                 nc = c + i * dc
-                if 0 <= nr < len(board) and 0 <= nc < len(board[0]) and board[nr][nc] == symbol:
+                if board.in_bounds(nr, nc) and board.get(nr, nc) == symbol:
                     count += 1
                 else:
                     break
             return count == 5
 
-        for r in range(len(board)):
-            for c in range(len(board[0])):
-                if board[r][c] == symbol:
+        for r in range(board.size):
+            for c in range(board.size):
+                if board.get(r, c) == symbol:
                     # Check all directions: right, down, down-right diagonal, down-left diagonal
                     if check_line(r, c, 0, 1) or check_line(r, c, 1, 0) or check_line(r, c, 1, 1) or check_line(r, c, 1,
                                                                                                                 -1):
@@ -104,7 +390,9 @@ class AlphaBetaAgent(Agent):
     def is_free(self, board, place):
         i = place[0]
         j = place[1]
-        return 0 <= i < len(board) and 0 <= j < len(board[0]) and board[i][j] is None
+        return board.in_bounds(i, j) and board.is_empty(i, j)
 
     def evaluation_function(self, board):
+        if self.evaluator is not None:
+            return self.evaluator.evaluate(self.color)
         return AgentsUtils.evaluation_state(board, self.color)
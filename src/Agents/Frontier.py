@@ -0,0 +1,113 @@
+import functools
+import random
+
+from src.Agents.AgentsUtils import border_offsets
+from src.Board import BOARD_SIZE, EMPTY
+
+
+@functools.lru_cache(maxsize=None)
+def cell_neighborhoods(size, distance=1):
+    """For every cell, the indices of the in-bounds cells at the `border_offsets(distance)` positions around it."""
+    offsets = border_offsets(distance)
+    neighborhoods = []
+    for r in range(size):
+        for c in range(size):
+            neighborhoods.append(tuple((r + dr) * size + c + dc for dr, dc in offsets
+                                       if 0 <= r + dr < size and 0 <= c + dc < size))
+    return tuple(neighborhoods)
+
+
+class Frontier:
+    """
+    Incremental set of the empty cells that have a stone within `distance` (the cells `find_shared_border_cells`
+    returns), for one board.
+
+    Every cell keeps the number of stones around it, so a push/pop only touches the neighbourhood of the changed cell.
+    The frontier cells are kept in a list plus a cell -> position dict, so adding, removing and drawing a random cell
+    are all O(1). Use push/pop next to the board's make_move/undo_move.
+    """
+
+    def __init__(self, size=BOARD_SIZE, distance=1):
+        self.size = size
+        self.distance = distance
+        self.neighborhoods = cell_neighborhoods(size, distance)
+        self.occupied = [False] * (size * size)
+        self.near = [0] * (size * size)  # Stones around every cell
+        self.cells = []  # Frontier cell indices, in no particular order
+        self.position = {}  # Cell index -> its position in self.cells
+        self.history = []
+
+    @classmethod
+    def from_board(cls, board, distance=1):
+        frontier = cls(board.size, distance)
+        for idx, code in enumerate(board.cells):
+            if code != EMPTY:
+                frontier.push(idx // board.size, idx % board.size)
+        frontier.history = []
+        return frontier
+
+    def push(self, row, col, color=None):
+        """Updates the frontier after a stone is placed on (row, col). The colour does not matter."""
+        idx = row * self.size + col
+        self.occupied[idx] = True
+        if idx in self.position:
+            self._remove(idx)
+        near, occupied = self.near, self.occupied
+        for neighbor in self.neighborhoods[idx]:
+            near[neighbor] += 1
+            if near[neighbor] == 1 and not occupied[neighbor]:
+                self._add(neighbor)
+        self.history.append(idx)
+
+    def pop(self):
+        """Reverts the last push."""
+        idx = self.history.pop()
+        near, position = self.near, self.position
+        for neighbor in self.neighborhoods[idx]:
+            near[neighbor] -= 1
+            if near[neighbor] == 0 and neighbor in position:
+                self._remove(neighbor)
+        self.occupied[idx] = False
+        if near[idx] > 0:
+            self._add(idx)
+        return idx
+
+    def _add(self, idx):
+        self.position[idx] = len(self.cells)
+        self.cells.append(idx)
+
+    def _remove(self, idx):
+        # Move the last cell into the freed position, so the list never has holes
+        position = self.position.pop(idx)
+        last = self.cells.pop()
+        if last != idx:
+            self.cells[position] = last
+            self.position[last] = position
+
+    def __len__(self):
+        return len(self.cells)
+
+    def __contains__(self, move):
+        return move[0] * self.size + move[1] in self.position
+
+    def moves(self):
+        """The frontier cells as (row, col) tuples, in row-major order."""
+        return [divmod(idx, self.size) for idx in sorted(self.cells)]
+
+    def choice(self):
+        """A random frontier cell, or a random empty cell when there is no stone on the board. None on a full board."""
+        if self.cells:
+            return divmod(random.choice(self.cells), self.size)
+        empty = [idx for idx, occupied in enumerate(self.occupied) if not occupied]
+        return divmod(random.choice(empty), self.size) if empty else None
+
+    def candidates(self):
+        """
+        Same as `find_shared_border_cells(board, distance)`: the frontier cells in random order, or two random empty
+        cells when there is no stone on the board.
+        """
+        if self.cells:
+            moves = self.moves()
+            return random.sample(moves, len(moves))
+        empty = [divmod(idx, self.size) for idx, occupied in enumerate(self.occupied) if not occupied]
+        return random.sample(empty, min(2, len(empty)))
@@ -0,0 +1,87 @@
+import functools
+
+from src.Agents.AgentsUtils import evaluation_line_chunks, score_line_codes, LINE_TABLES
+from src.Board import as_board, COLOR_CODES, BLACK, WHITE
+
+
+@functools.lru_cache(maxsize=None)
+def cell_line_slots(size):
+    """
+    For every cell, where it sits in the evaluation lines through it (its row, column and up to two diagonals):
+    (line id, chunk position in the line, base-3 weight of the cell in that chunk).
+    """
+    slots = [[] for _ in range(size * size)]
+    for line_id, chunks in enumerate(evaluation_line_chunks(size)):
+        for position, chunk in enumerate(chunks):
+            for offset, idx in enumerate(chunk):
+                slots[idx].append((line_id, position, 3 ** offset))
+    return tuple(tuple(cell_slots) for cell_slots in slots)
+
+
+class IncrementalEvaluator:
+    """
+    Keeps the `evaluate_line` score of every evaluation line, for both colours and both values of `current`, so
+    `evaluate(current_color)` returns the same value as `AgentsUtils.evaluation_state` without scanning the board.
+
+    Every line is stored as the base-3 codes of its chunks, so after a move only the four lines through its cell get
+    their codes patched and are rescored with the line tables. Use push/pop next to the board's
+    make_move/undo_move so both stay in sync during a search.
+    """
+
+    # Order of the per-line scores
+    BLACK_CURRENT, BLACK_OTHER, WHITE_CURRENT, WHITE_OTHER = range(4)
+
+    def __init__(self, board):
+        board = as_board(board)
+        self.size = board.size
+        self.cell_slots = cell_line_slots(self.size)
+        chunks = evaluation_line_chunks(self.size)
+        self.chunk_lengths = [tuple(len(chunk) for chunk in line_chunks) for line_chunks in chunks]
+        self.chunk_codes = [[0] * len(line_chunks) for line_chunks in chunks]
+        for idx, code in enumerate(board.cells):
+            if code:
+                for line_id, position, weight in self.cell_slots[idx]:
+                    self.chunk_codes[line_id][position] += code * weight
+        self.line_scores = [self._score_line(line_id) for line_id in range(len(chunks))]
+        self.totals = [sum(scores[i] for scores in self.line_scores) for i in range(4)]
+        self.history = []
+
+    def _score_line(self, line_id):
+        codes, lengths = self.chunk_codes[line_id], self.chunk_lengths[line_id]
+        return score_line_codes(codes, lengths, LINE_TABLES[BLACK]) + score_line_codes(codes, lengths,
+                                                                                        LINE_TABLES[WHITE])
+
+    def push(self, row, col, color):
+        """Updates the scores after a stone of `color` is placed on (row, col)."""
+        code = COLOR_CODES[color] if color.__class__ is str else color
+        idx = row * self.size + col
+        totals, line_scores, chunk_codes = self.totals, self.line_scores, self.chunk_codes
+        previous = []
+        for line_id, position, weight in self.cell_slots[idx]:
+            chunk_codes[line_id][position] += code * weight
+            old = line_scores[line_id]
+            new = self._score_line(line_id)
+            for i in range(4):
+                totals[i] += new[i] - old[i]
+            line_scores[line_id] = new
+            previous.append(old)
+        self.history.append((idx, code, previous))
+
+    def pop(self):
+        """Reverts the last push."""
+        idx, code, previous = self.history.pop()
+        totals, line_scores, chunk_codes = self.totals, self.line_scores, self.chunk_codes
+        for (line_id, position, weight), old in zip(self.cell_slots[idx], previous):
+            chunk_codes[line_id][position] -= code * weight
+            new = line_scores[line_id]
+            for i in range(4):
+                totals[i] += old[i] - new[i]
+            line_scores[line_id] = old
+        return idx
+
+    def evaluate(self, current_color):
+        """Same value as `AgentsUtils.evaluation_state(board, current_color)` for the tracked board."""
+        totals = self.totals
+        if current_color == "black":
+            return totals[self.BLACK_CURRENT] - totals[self.WHITE_OTHER]
+        return -1 * (totals[self.BLACK_OTHER] - totals[self.WHITE_CURRENT])
@@ -1,17 +1,165 @@
-import copy
+import math
+import multiprocessing
 import random
+import time
 import numpy as np
 from src.Agents import AgentsUtils as utils
+from src.Agents.Frontier import Frontier
+from src.Agents.TranspositionTable import NodeStatsTable
+from src.Agents.RolloutEngine import RolloutEngine, HEURISTIC_ROLLOUT, FAST_ROLLOUT
 from src.Agents.agent import Agent
+from src.Board import as_board, Board, BLACK, WHITE, COLORS, COLOR_CODES, opponent_code
+
+ROOT_PARALLEL = 'root'  # Independent trees, one per worker, merged by the visits of the root moves
+TREE_PARALLEL = 'tree'  # One tree, the rollouts of a batch of leaves run in the workers, spread with virtual loss
+
+LEAST_VISITED = 'visits'  # Evicts the subtrees of the least visited nodes first
+LEAST_RECENT = 'lru'  # Evicts the subtrees of the nodes no simulation went through for the longest first
+
+NO_NODE = -1
+INITIAL_CAPACITY = 1024
+MIN_CAPACITY = 16  # First node pool of a tree under a memory budget, it grows while the budget allows
+EVICTION_FRACTION = 0.05  # Share of the nodes an eviction frees at least, so it does not run every simulation
+
+# Agent of an MCTS worker process, set once by _init_mcts_worker
+_worker_agent = None
+
+
+def _init_mcts_worker(agent):
+    global _worker_agent
+    _worker_agent = agent
+
+
+def _board_from_cells(cells, size):
+    board = Board(size)
+    for idx, code in enumerate(cells):
+        if code:
+            board.make_move(idx // size, idx % size, code)
+    return board
+
+
+def _rollout_task(task):
+    cells, size, player_to_move, agent_color, terminal, seed = task
+    random.seed(seed)
+    return _worker_agent.rollout(_board_from_cells(cells, size), player_to_move, agent_color, terminal)
+
+
+def _search_task(task):
+    cells, size, color, n_simulations, time_limit, max_nodes, seed = task
+    random.seed(seed)
+    tree = _worker_agent.search(_board_from_cells(cells, size), color, n_simulations, time_limit, max_nodes)
+    children = [(tree.move_of(child), int(tree.visits[child]), float(tree.scores[child]))
+                for child in tree.children(0)]
+    return children, tree.size, tree.peak_memory, tree.peak_size, tree.evicted
 
 
 class MCTSAgent(Agent):
-    def __init__(self, n_simulations=2, m_steps=2, evaluation_fn=None, exploration_weight=1.41):
+    def __init__(self, n_simulations=2, m_steps=2, evaluation_fn=None, exploration_weight=1.41, reuse_tree=True,
+                 n_workers=1, parallel_mode=TREE_PARALLEL, time_limit=None, max_nodes=None,
+                 rollout_policy=HEURISTIC_ROLLOUT, batch_size=1, transpositions=False, table_bits=16, rave=False,
+                 rave_equivalence=1000, widening=False, widening_constant=1.0, widening_exponent=0.5,
+                 prior_weight=1.0, node_budget=None, memory_budget=None, eviction=LEAST_VISITED):
+        """
+        :param n_simulations: Simulations per move, ignored when `time_limit` is set.
+        :param reuse_tree: Keeps the subtree of the position after the agent's move and the opponent's reply, so
+                           the next move starts from the statistics already gathered for it.
+        :param n_workers: Worker processes, 1 runs every simulation in this process.
+        :param parallel_mode: ROOT_PARALLEL splits the simulations between independent trees and merges their root
+                              visits. TREE_PARALLEL keeps one tree here and runs the rollouts of n_workers leaves at a
+                              time in the workers, virtual loss makes the leaves of a batch differ.
+        :param time_limit: Seconds per move. When set, the agent simulates until the time runs out.
+        :param max_nodes: Stops the search once the tree holds this many nodes (reused ones included).
+        The search stops at the first limit reached, but always runs at least one simulation.
+        :param rollout_policy: HEURISTIC_ROLLOUT lets the agent pick among the top `mixed_heuristic` moves in its
+                               rollouts. FAST_ROLLOUT plays a win or a block when there is one and a random frontier
+                               cell otherwise, on a RolloutEngine that tracks the working board incrementally.
+        :param batch_size: Simulations per batch of the serial search. Above 1, the leaves of a batch are selected
+                           under virtual loss, their rollouts played, and the final positions are scored together by
+                           `AgentsUtils.evaluation_function_batch` before backpropagating.
+        :param transpositions: Nodes of the same position (the same stones reached in another order) pool their
+                               visits and scores in a NodeStatsTable of 2 ** table_bits entries.
+        :param rave: Every move a player makes later in a simulation, in the tree or in the rollout, also counts as
+                     an all-moves-as-first (AMAF) sample for the sibling of that move, and selection blends the AMAF
+                     mean into the child value with weight sqrt(k / (3 * visits + k)), k = `rave_equivalence`: the
+                     number of visits at which both count the same. Tree-parallel rollouts run in the workers, so
+                     there only the tree moves are credited.
+        :param widening: Progressive widening. The moves of a node are its `mixed_heuristic` moves, best first, and
+                         only ceil(widening_constant * (visits + 1) ** widening_exponent) of them are expanded, so
+                         the simulations go deeper instead of first trying every move of every node. The heuristic
+                         score of a move relative to the best one is its prior, UCB adds
+                         prior_weight * prior / (visits + 1), in units of the largest child value.
+        :param node_budget: Most nodes the tree holds. Its node pool is allocated at this size up front, and when a
+                            simulation would go over it, subtrees are evicted and the search goes on.
+        :param memory_budget: Most bytes the tree takes, node arrays and untried move lists, estimated by
+                              MCTSTree.memory. The node pool starts small and grows while it fits, and before every
+                              simulation subtrees are evicted until its worst-case expansion fits too, so the peak
+                              stays within the budget. MemoryError when the root alone does not fit.
+        :param eviction: LEAST_VISITED evicts the subtrees of the least visited nodes first, LEAST_RECENT those no
+                         simulation went through for the longest. The move of an evicted subtree can be expanded
+                         again. Both budgets are per tree, so per worker when root parallel.
+        """
+        if parallel_mode not in (ROOT_PARALLEL, TREE_PARALLEL):
+            raise ValueError(f"Unknown parallel mode: {parallel_mode}")
+        if rollout_policy not in (HEURISTIC_ROLLOUT, FAST_ROLLOUT):
+            raise ValueError(f"Unknown rollout policy: {rollout_policy}")
+        if eviction not in (LEAST_VISITED, LEAST_RECENT):
+            raise ValueError(f"Unknown eviction policy: {eviction}")
         super(MCTSAgent, self).__init__()
         self.n_simulations = n_simulations
         self.m_steps = m_steps
         self.evaluation_fn = evaluation_fn if evaluation_fn is not None else utils.evaluation_function
         self.exploration_weight = exploration_weight
+        self.reuse_tree = reuse_tree
+        self.color = None  # Colour of the agent, set by make_move
+        self.frontier = None  # Frontier of the board the current simulation is at, during make_move
+        self.rollout_policy = rollout_policy
+        self.engine = None  # RolloutEngine of the working board during a serial FAST_ROLLOUT search
+        self.batch_size = batch_size
+        self.transpositions = transpositions
+        self.table_bits = table_bits
+        self.stats_table = None  # NodeStatsTable, built on the first move that uses it
+        self.rave = rave
+        self.rave_equivalence = rave_equivalence
+        self.widening = widening
+        self.widening_constant = widening_constant
+        self.widening_exponent = widening_exponent
+        self.prior_weight = prior_weight
+        self.node_budget = node_budget
+        self.memory_budget = memory_budget
+        self.eviction = eviction
+        self.tree = None  # Tree of the last search, kept for tree reuse
+        self.played = None  # Node of the root child that was played
+        self.reused_visits = 0  # Visits of the reused subtree at the start of the last move
+        self.n_workers = n_workers
+        self.parallel_mode = parallel_mode
+        self.result_range = None  # (lowest, highest) rollout score of the current move, scales the virtual loss
+        self.time_limit = time_limit
+        self.max_nodes = max_nodes
+        self.simulations = 0  # Simulations of the last move
+        self.tree_nodes = 0  # Tree size at the end of the last move, summed over the trees when root parallel
+        self.search_seconds = 0.0
+        self.peak_memory = 0  # Largest tree memory estimate during the last move, in bytes, summed like tree_nodes
+        self.peak_nodes = 0
+        self.evicted_nodes = 0
+        self._pool = None
+
+    def __getstate__(self):
+        # Workers get the settings only, not the tree or the pool of this process
+        state = self.__dict__.copy()
+        state['_pool'] = state['tree'] = state['played'] = state['engine'] = state['stats_table'] = None
+        return state
+
+    def close(self):
+        """Stops the worker processes."""
+        if self._pool is not None:
+            self._pool.terminate()
+            self._pool.join()
+            self._pool = None
+
+    def _get_pool(self):
+        if self._pool is None:
+            self._pool = multiprocessing.Pool(processes=self.n_workers, initializer=_init_mcts_worker, initargs=(self,))
+        return self._pool
 
     def make_move(self, game_state):
         """
@@ -19,22 +167,364 @@ class MCTSAgent(Agent):
         :param game_state: Current state of the game (the board).
         :return: The selected move (row, col).
         """
-        board = game_state['board']
+        start = time.perf_counter()
+        board = as_board(game_state['board'])
         current_player = game_state['current_player']
+        self.color = current_player
+        parallel = self.n_workers > 1 and not multiprocessing.current_process().daemon
+        n_simulations = self.n_simulations if self.time_limit is None else None
+        deadline = start + self.time_limit if self.time_limit is not None else None
+        if self.stats_table is not None:
+            self.stats_table.new_search()
+
+        try:
+            if parallel and self.parallel_mode == ROOT_PARALLEL:
+                return self._root_parallel_move(board, current_player, n_simulations, deadline)
+
+            tree = self._reused_tree(board, current_player)
+            if tree is None:
+                tree = self._new_tree(board, current_player)
+            self.reused_visits = int(tree.visits[0])
+
+            if parallel:
+                self._tree_parallel_search(tree, n_simulations, deadline, self.max_nodes)
+            else:
+                self._run_simulations(tree, n_simulations, deadline, self.max_nodes)
+            self.simulations = int(tree.visits[0]) - self.reused_visits
+            self.tree_nodes = tree.size
+            tree.track_peak()
+            self.peak_memory, self.peak_nodes, self.evicted_nodes = tree.peak_memory, tree.peak_size, tree.evicted
+
+            # Return the move with the highest number of visits
+            children = tree.children(0)
+            best_child = children[int(np.argmax(tree.visits[children]))]
+            if self.reuse_tree:
+                self.tree, self.played = tree, best_child
+            return tree.move_of(best_child)
+        finally:
+            self.search_seconds = time.perf_counter() - start
+
+    def search(self, board, color, n_simulations, time_limit=None, max_nodes=None):
+        """
+        Searches from a fresh root for `color` to move on `board` within the given limits (None is unlimited) and
+        returns the tree.
+        """
+        self.color = color
+        deadline = time.perf_counter() + time_limit if time_limit is not None else None
+        tree = self._new_tree(board, color)
+        self._run_simulations(tree, n_simulations, deadline, max_nodes)
+        tree.track_peak()
+        return tree
+
+    def _new_tree(self, board, color):
+        """A fresh tree for `color` to move on `board`, the statistics of earlier searches are dropped."""
+        table = None
+        if self.transpositions:
+            if self.stats_table is None:
+                self.stats_table = NodeStatsTable(self.table_bits)
+            table = self.stats_table
+            table.clear()
+        untried_moves, priors = self._untried_moves(board, color, Frontier.from_board(board))
+        max_capacity = self._pool_capacity()
+        if self.memory_budget is not None:
+            capacity = MIN_CAPACITY
+        else:
+            capacity = self.node_budget if self.node_budget is not None else INITIAL_CAPACITY
+        return MCTSTree(board, color, untried_moves, capacity=capacity, table=table, untried_priors=priors,
+                        max_capacity=max_capacity)
+
+    def _pool_capacity(self):
+        """Most node slots the budgets allow, None without a budget."""
+        limits = []
+        if self.node_budget is not None:
+            limits.append(self.node_budget)
+        if self.memory_budget is not None:
+            limits.append(self.memory_budget // MCTSTree.NODE_BYTES)
+        return max(2, min(limits)) if limits else None
+
+    def _make_room(self, tree, needed):
+        """
+        Evicts subtrees until `needed` more nodes fit in the budgets, called before a simulation or batch selects, so
+        no node of a pending simulation is evicted. Raises MemoryError when the root alone does not fit.
+        """
+        if self.node_budget is None and self.memory_budget is None:
+            return
+        tree.track_peak()
+        least_recent = self.eviction == LEAST_RECENT
+        slack = max(1, int(tree.size * EVICTION_FRACTION))
+        if self.node_budget is not None and tree.size + needed > self.node_budget:
+            tree.evict(tree.size + needed - self.node_budget + slack, least_recent)
+        if self.memory_budget is not None:
+            while tree.memory(needed) > self.memory_budget:
+                if tree.size == 1:
+                    raise MemoryError(f"memory_budget of {self.memory_budget} bytes is too small for the MCTS root")
+                tree.evict(needed + slack, least_recent)
+                slack = max(1, int(tree.size * EVICTION_FRACTION))
+
+    def search_stats(self):
+        """Counters of the last move, to check the per-move latency."""
+        stats = {'simulations': self.simulations, 'seconds': self.search_seconds,
+                 'simulations_per_second': self.simulations / self.search_seconds if self.search_seconds else 0.0,
+                 'tree_nodes': self.tree_nodes, 'reused_visits': self.reused_visits,
+                 'peak_memory': self.peak_memory, 'peak_nodes': self.peak_nodes, 'evicted_nodes': self.evicted_nodes}
+        if self.stats_table is not None:
+            stats.update(self.stats_table.stats())
+        return stats
+
+    @staticmethod
+    def _budget_left(tree, done, n_simulations, deadline, max_nodes):
+        """False once a limit is reached, the first simulation always runs so the root has a child to play."""
+        if done == 0:
+            return True
+        if n_simulations is not None and done >= n_simulations:
+            return False
+        if max_nodes is not None and tree.size >= max_nodes:
+            return False
+        return deadline is None or time.perf_counter() < deadline
+
+    def _run_simulations(self, tree, n_simulations, deadline=None, max_nodes=None):
+        # One working board and frontier, the path of every simulation is played on them and taken back after
+        board = tree.board.copy()
+        self.frontier = Frontier.from_board(board)
+        if self.rollout_policy == FAST_ROLLOUT:
+            # Batches score their positions with evaluation_function_batch, the engine needs no evaluator for them
+            evaluation_fn = self.evaluation_fn if self.batch_size > 1 else self._rollout_evaluation()
+            self.engine = RolloutEngine(board, self.frontier, evaluation_fn)
+        done = 0
+        try:
+            if self.batch_size > 1:
+                self._batched_simulations(tree, board, n_simulations, deadline, max_nodes)
+                return
+            # Simulate until the simulation, time or node budget runs out
+            while self._budget_left(tree, done, n_simulations, deadline, max_nodes):
+                self._make_room(tree, 1)
+                node = self._select(tree)
+                path = self._play_path(tree, node, board)
+                if self._expandable(tree, node):
+                    node = self._expand(tree, node, board)
+                    path.append(node)
+                rollout_moves = [] if self.rave else None
+                result = self._simulate(tree, node, board, rollout_moves)
+                tree.backpropagate(node, result)
+                if self.rave:
+                    tree.update_amaf([0] + path, rollout_moves, result)
+                self._take_back(tree, path, board)
+                done += 1
+        finally:
+            self.frontier = self.engine = None
+
+    def _simulate(self, tree, node, board, rollout_moves=None):
+        """
+        The rollout result of `node`, the working board is at `node`. The rollout moves are added to
+        `rollout_moves` when given.
+        """
+        player, terminal = tree.player[node], tree.terminal[node]
+        if self.engine is not None:
+            played = self.engine.playout(player, self.m_steps, terminal)
+            if played is None:
+                return 0
+            if rollout_moves is not None:
+                rollout_moves.extend(played)
+            try:
+                return self.engine.evaluate(self.color)
+            finally:
+                self.engine.take_back(played)
+        if terminal:
+            return self.evaluation_fn(board, self.color)
+        final_board = self._heuristic_playout(board, COLORS[player], self.color, self.frontier, rollout_moves)
+        return self.evaluation_fn(final_board, self.color) if final_board is not None else 0
+
+    def _batched_simulations(self, tree, board, n_simulations, deadline, max_nodes):
+        """
+        Runs the simulations in batches of `batch_size` on the working board: every leaf is selected under the
+        virtual loss of the ones before it, its rollout played and its final position kept, then the whole batch is
+        evaluated at once and backpropagated.
+        """
+        self.result_range = None
+        done = 0
+        while self._budget_left(tree, done, n_simulations, deadline, max_nodes):
+            batch_size = self._batch_limit(tree, self.batch_size, done, n_simulations, max_nodes)
+            self._make_room(tree, batch_size)
+            batch = []
+            positions = []  # Cells of the final positions still to evaluate, by batch entry
+            for _ in range(batch_size):
+                if batch and deadline is not None and time.perf_counter() >= deadline:
+                    break
+                node = self._select(tree)
+                path = self._play_path(tree, node, board)
+                if self._expandable(tree, node):
+                    node = self._expand(tree, node, board)
+                    path.append(node)
+                rollout_moves = [] if self.rave else None
+                positions.append(self._playout_cells(tree, node, board, rollout_moves))
+                self._take_back(tree, path, board)
+                batch.append((node, self._add_virtual_loss(tree, node), [0] + path, rollout_moves))
+
+            results = self._evaluate_positions(positions, board.size)
+            for (node, losses, path, rollout_moves), result in zip(batch, results):
+                self._remove_virtual_loss(tree, node, losses)
+                tree.backpropagate(node, result)
+                if self.rave:
+                    tree.update_amaf(path, rollout_moves, result)
+                low, high = self.result_range or (result, result)
+                self.result_range = (min(low, result), max(high, result))
+            done += len(batch)
+
+    def _playout_cells(self, tree, node, board, rollout_moves=None):
+        """
+        The cells of the position a rollout from `node` ends in, None for a draw. The working board is at `node`, the
+        rollout moves are added to `rollout_moves` when given.
+        """
+        player, terminal = COLORS[tree.player[node]], tree.terminal[node]
+        if self.engine is not None:
+            played = self.engine.playout(player, self.m_steps, terminal)
+            if played is None:
+                return None
+            if rollout_moves is not None:
+                rollout_moves.extend(played)
+            cells = board.cells[:]
+            self.engine.take_back(played)
+            return cells
+        if terminal:
+            return board.cells[:]
+        final_board = self._heuristic_playout(board, player, self.color, self.frontier, rollout_moves)
+        return final_board.cells if final_board is not None else None
 
-        root_node = MCTSNode(board, current_player)
+    def _evaluate_positions(self, positions, size):
+        """Rollout results of `_playout_cells` positions, the default evaluation scores them in one batch."""
+        scored = [cells for cells in positions if cells is not None]
+        if self.evaluation_fn is utils.evaluation_function:
+            scores = iter(utils.evaluation_function_batch(np.array(scored, dtype=np.int64).reshape(-1, size * size),
+                                                          self.color))
+        else:
+            scores = iter([self.evaluation_fn(_board_from_cells(cells, size), self.color) for cells in scored])
+        return [next(scores) if cells is not None else 0 for cells in positions]
 
-        # Run n_simulations to explore the game tree
-        for _ in range(self.n_simulations):
-            node = self._select(root_node)
-            if not node.is_fully_expanded():
-                node = node.expand()
-            result = self.simulate_move(node, game_state)
-            node.backpropagate(result)
+    @staticmethod
+    def _batch_limit(tree, batch_size, done, n_simulations, max_nodes):
+        """`batch_size` cut down to the simulations and nodes left and to the node pool, at least 1."""
+        if n_simulations is not None:
+            batch_size = min(batch_size, n_simulations - done)
+        if tree.max_capacity is not None:
+            batch_size = min(batch_size, tree.max_capacity - 1)
+        if max_nodes is not None:
+            batch_size = max(1, min(batch_size, max_nodes - tree.size))
+        return batch_size
 
-        # Return the move with the highest number of visits
-        best_child = max(root_node.children, key=lambda child: child.visits)
-        return best_child.move
+    def _root_parallel_move(self, board, color, n_simulations, deadline):
+        """
+        Every worker grows its own tree with a share of the simulations and nodes, or for the whole time limit, the
+        root visits are summed per move.
+        """
+        if n_simulations is None:
+            shares = [None] * self.n_workers
+        else:
+            shares = [n_simulations // self.n_workers + (i < n_simulations % self.n_workers)
+                      for i in range(self.n_workers)]
+            shares = [share for share in shares if share]
+        time_limit = None if deadline is None else max(0.0, deadline - time.perf_counter())
+        max_nodes = None if self.max_nodes is None else max(1, self.max_nodes // len(shares))
+        tasks = [(board.cells, board.size, color, share, time_limit, max_nodes, random.getrandbits(32))
+                 for share in shares]
+        visits = {}
+        self.tree_nodes = self.peak_memory = self.peak_nodes = self.evicted_nodes = 0
+        # The trees grow side by side, so their peaks add up
+        for children, tree_nodes, peak_memory, peak_nodes, evicted in self._get_pool().map(_search_task, tasks,
+                                                                                          chunksize=1):
+            self.tree_nodes += tree_nodes
+            self.peak_memory += peak_memory
+            self.peak_nodes += peak_nodes
+            self.evicted_nodes += evicted
+            for move, child_visits, _ in children:
+                visits[move] = visits.get(move, 0) + child_visits
+        self.reused_visits = 0
+        self.simulations = sum(visits.values())
+        return max(visits, key=visits.get)
+
+    def _tree_parallel_search(self, tree, n_simulations, deadline=None, max_nodes=None):
+        """
+        Selects and expands up to n_workers leaves, each under a virtual loss so the next selection prefers other
+        paths, then runs their rollouts in the workers and backpropagates the real results.
+        """
+        pool = self._get_pool()
+        self.result_range = None
+        board = tree.board.copy()
+        self.frontier = Frontier.from_board(board)
+        done = 0
+        try:
+            while self._budget_left(tree, done, n_simulations, deadline, max_nodes):
+                batch_size = self._batch_limit(tree, self.n_workers, done, n_simulations, max_nodes)
+                self._make_room(tree, batch_size)
+                batch = []
+                tasks = []
+                for _ in range(batch_size):
+                    node = self._select(tree)
+                    path = self._play_path(tree, node, board)
+                    if self._expandable(tree, node):
+                        node = self._expand(tree, node, board)
+                        path.append(node)
+                    tasks.append((board.cells[:], board.size, COLORS[tree.player[node]], self.color,
+                                  bool(tree.terminal[node]), random.getrandbits(32)))
+                    self._take_back(tree, path, board)
+                    batch.append((node, self._add_virtual_loss(tree, node), [0] + path))
+
+                for (node, losses, path), result in zip(batch, pool.map(_rollout_task, tasks, chunksize=1)):
+                    self._remove_virtual_loss(tree, node, losses)
+                    tree.backpropagate(node, result)
+                    if self.rave:
+                        tree.update_amaf(path, [], result)
+                    low, high = self.result_range or (result, result)
+                    self.result_range = (min(low, result), max(high, result))
+                done += len(batch)
+        finally:
+            self.frontier = None
+
+    def _add_virtual_loss(self, tree, node):
+        """
+        Counts one lost visit on every node of the path: the lowest score seen so far where the agent chose the
+        move, the highest where the opponent did. Returns the scores added, for `_remove_virtual_loss`.
+        """
+        low, high = self.result_range or (0, 0)
+        agent_code = COLOR_CODES[self.color]
+        losses = []
+        while node != NO_NODE:
+            parent = tree.parent[node]
+            chooser = tree.player[parent] if parent != NO_NODE else agent_code
+            loss = low if chooser == agent_code else high
+            tree.update(node, 1, loss)
+            losses.append(loss)
+            node = parent
+        return losses
+
+    @staticmethod
+    def _remove_virtual_loss(tree, node, losses):
+        for loss in losses:
+            tree.update(node, -1, -loss)
+            node = tree.parent[node]
+
+    def _reused_tree(self, board, current_player):
+        """
+        The subtree of the previous tree for `board`: the child played last turn, then its child for the opponent's
+        reply. It becomes a new, compacted tree and the rest of the old tree is dropped. None on a miss.
+        """
+        tree, played = self.tree, self.played
+        self.tree = self.played = None
+        if not self.reuse_tree or tree is None or COLORS[tree.player[0]] != current_player:
+            return None
+
+        expected = tree.board.copy()
+        row, col = tree.move_of(played)
+        if not expected.is_empty(row, col):
+            return None
+        expected.make_move(row, col, tree.player[0])
+        # The opponent's reply is the one cell where the boards differ
+        reply = [idx for idx, (old, new) in enumerate(zip(expected.cells, board.cells)) if old != new]
+        if len(reply) != 1 or expected.cells[reply[0]] != 0 or board.cells[reply[0]] != tree.player[played]:
+            return None
+        for child in tree.children(played):
+            if tree.move[child] == reply[0]:
+                return tree.subtree(child, board)
+        return None
 
     @staticmethod
     def _make_move_on_board(board, row, col, color):
@@ -45,8 +535,8 @@ class MCTSAgent(Agent):
         :param col: The column to place the stone.
         :param color: The color of the stone ('black' or 'white').
         """
-        if board[row][col] is None:
-            board[row][col] = color
+        if board.is_empty(row, col):
+            board.make_move(row, col, color)
         else:
             return
 
@@ -54,21 +544,20 @@ class MCTSAgent(Agent):
     def _check_win_on_board(board, row, col, color):
         """Checks if the current move leads to a win."""
         directions = [(1, 0), (0, 1), (1, 1), (1, -1)]  # Horizontal, Vertical, Diagonal, Anti-diagonal
-        player = board[row][col]
-        board_size = len(board)
+        board_size = board.size
 
         for dr, dc in directions:
             count = 1
             for i in range(1, 5):
                 r, c = row + dr * i, col + dc * i
-                if 0 <= r < board_size and 0 <= c < board_size and board[r][c] == color:
+                if 0 <= r < board_size and 0 <= c < board_size and board.get(r, c) == color:
                     count += 1
                 else:
                     break
 
             for i in range(1, 5):
                 r, c = row - dr * i, col - dc * i
-                if 0 <= r < board_size and 0 <= c < board_size and board[r][c] == color:
+                if 0 <= r < board_size and 0 <= c < board_size and board.get(r, c) == color:
                     count += 1
                 else:
                     break
@@ -77,110 +566,470 @@ class MCTSAgent(Agent):
                 return True
         return False
 
-    def _select(self, node):
+    def _play_path(self, tree, node, board):
+        """
+        Plays the moves from the root down to `node` on the working board and frontier, returns the nodes played.
+        """
+        path = []
+        while tree.parent[node] != NO_NODE:
+            path.append(node)
+            node = tree.parent[node]
+        path.reverse()
+        for child in path:
+            row, col = tree.move_of(child)
+            self._push(board, row, col, tree.player[tree.parent[child]])
+        return path
+
+    def _take_back(self, tree, path, board):
+        for child in reversed(path):
+            self._pop(board, *tree.move_of(child))
+
+    def _push(self, board, row, col, code):
+        """Plays a move on the working board and everything that tracks it."""
+        if self.engine is not None:
+            self.engine.push(row, col, code)
+        else:
+            board.make_move(row, col, code)
+            self.frontier.push(row, col, code)
+
+    def _pop(self, board, row, col):
+        if self.engine is not None:
+            self.engine.pop(row, col)
+        else:
+            board.undo_move(row, col)
+            self.frontier.pop()
+
+    def _expand(self, tree, node, board):
+        """
+        Expand the tree by trying an untried move of `node`, the working board is at `node`. Creates the child node
+        and leaves the board and frontier at it.
+        """
+        move, prior = tree.pop_untried(node)  # Remove the move from the list of untried moves
+        code = tree.player[node]
+        self._push(board, move[0], move[1], code)
+        terminal = MCTSAgent._check_win_on_board(board, move[0], move[1], COLORS[code])
+        untried_moves, priors = [], None
+        if not terminal:
+            untried_moves, priors = self._untried_moves(board, opponent_code(code), self.frontier)
+
+        # Plies alternate, in the child state the other player is to move
+        return tree.add_node(node, move, opponent_code(code), terminal, untried_moves, prior, priors)
+
+    def _untried_moves(self, board, color, frontier):
+        """
+        The moves to expand at `board` with `color` to move, and their priors. Without widening they are the
+        frontier candidates in random order and have no priors. With it they are the `mixed_heuristic` moves with
+        the best one last, as moves are expanded from the end of the list.
+        """
+        if self.widening:
+            scored = utils.mixed_heuristic_scores(board, COLORS[color] if color.__class__ is not str else color,
+                                                  utils.MAX_VALID_MOVES, noise=False)
+            if scored:
+                top = scored[0][1]
+                scored.reverse()
+                return [move for move, _ in scored], [score / top for _, score in scored]
+        return frontier.candidates(), None
+
+    def _expandable(self, tree, node):
+        """True when `node` has an untried move and, with widening, fewer children than its visits allow."""
+        if tree.is_fully_expanded(node):
+            return False
+        if not self.widening:
+            return True
+        allowed = math.ceil(self.widening_constant * (tree.visits[node] + 1) ** self.widening_exponent)
+        return tree.child_count[node] < allowed
+
+    def _select(self, tree):
         """
         Traverse the tree by selecting the best child until a leaf node is found.
         """
-        while node.is_fully_expanded() and node.children:
-            node = node.best_child(self.exploration_weight)
+        node = 0
+        agent_code = COLOR_CODES[self.color]
+        while not self._expandable(tree, node) and tree.first_child[node] != NO_NODE:
+            node = tree.best_child(node, self.exploration_weight, maximize=tree.player[node] == agent_code,
+                                   rave_equivalence=self.rave_equivalence if self.rave else None,
+                                   prior_weight=self.prior_weight if self.widening else None)
         return node
 
-    def simulate_move(self, node, game_state):
+    def rollout(self, board, player_to_move, agent_color, terminal=False, frontier=None):
         """
-        Simulate a game for a specific move, alternating between the current player and the opponent.
-        :param game_state: The game state to simulate.
-        :param move: The initial move to simulate.
-        :param opponent_agent: The opponent agent, whose make_move() will be called during their turn.
-        :return: The score of the board after simulating the move.
+        Plays up to `m_steps` moves from `board`, the agent picks among the top `mixed_heuristic` moves and the
+        opponent plays randomly next to the stones. Returns the evaluation of the final board for the agent.
+        :param frontier: Frontier of `board`, it is restored before returning. A new one is built when None.
         """
-        simulated_board = copy.deepcopy(node.board)
-        current_player = 'white' if node.current_player == 'black' else 'black'
+        if self.rollout_policy == FAST_ROLLOUT:
+            engine = RolloutEngine(board.copy(), evaluation_fn=self._rollout_evaluation())
+            return engine.rollout(player_to_move, agent_color, self.m_steps, terminal)
+        if terminal:
+            return self.evaluation_fn(board, agent_color)
+        final_board = self._heuristic_playout(board, player_to_move, agent_color, frontier)
+        return self.evaluation_fn(final_board, agent_color) if final_board is not None else 0
 
-        # Simulate for `m_steps` or until the game ends
-        for _ in range(self.m_steps):
-            if current_player == node.current_player:
+    def _heuristic_playout(self, board, player_to_move, agent_color, frontier=None, played=None):
+        """
+        The moves of a HEURISTIC_ROLLOUT, played on a copy of `board`. Returns the copy, or None when the game ends
+        in a draw. `frontier` is restored before returning, the moves are added to `played` when given.
+        """
+        simulated_board = board.copy()
+        frontier = frontier if frontier is not None else Frontier.from_board(simulated_board)
+        current_player = player_to_move
+        pushed = 0
 
-                # Current player (MCTS agent)
-                legal_moves = utils.mixed_heuristic(simulated_board, current_player, k=30)
-                if legal_moves == []:
-                    legal_moves = utils.find_shared_border_cells(simulated_board, distance=1)
+        try:
+            # Simulate for `m_steps` or until the game ends
+            for _ in range(self.m_steps):
+                if current_player == agent_color:
 
-                if not legal_moves:  # No more legal moves, draw
-                    return 0
+                    # Current player (MCTS agent)
+                    legal_moves = utils.mixed_heuristic(simulated_board, current_player, k=30)
+                    if legal_moves == []:
+                        legal_moves = frontier.candidates()
 
-                move = random.choice(legal_moves)
-                MCTSAgent._make_move_on_board(simulated_board, move[0], move[1], current_player)
-            else:
-                # Opponent agent moves
-                move = random.choice(utils.find_shared_border_cells(simulated_board, distance=1))
+                    if not legal_moves:  # No more legal moves, draw
+                        return None
+
+                    move = random.choice(legal_moves)
+                else:
+                    # Opponent agent moves
+                    move = frontier.choice()
+                    if move is None:  # Full board, draw
+                        return None
                 MCTSAgent._make_move_on_board(simulated_board, move[0], move[1], current_player)
+                frontier.push(move[0], move[1], current_player)
+                pushed += 1
+                if played is not None:
+                    played.append(move)
 
-            if MCTSAgent._check_win_on_board(simulated_board, move[0], move[1], current_player):
-                # Will calculate the score after the loop
-                break
+                if MCTSAgent._check_win_on_board(simulated_board, move[0], move[1], current_player):
+                    break
+
+                # Switch player
+                current_player = 'white' if current_player == 'black' else 'black'
 
-            # Switch player
-            current_player = 'white' if current_player == 'black' else 'black'
+            return simulated_board
+        finally:
+            for _ in range(pushed):
+                frontier.pop()
 
-        return self.evaluation_fn(simulated_board, game_state['current_player'])
+    def _rollout_evaluation(self):
+        """The evaluation_fn of a RolloutEngine, None when it can use its incremental evaluation instead."""
+        return None if self.evaluation_fn is utils.evaluation_function else self.evaluation_fn
 
     def get_type(self):
         return 'MCTS'
 
 
-class MCTSNode:
-    def __init__(self, board, current_player, parent=None, move=None):
-        self.board = board  # The current state of the game board (2D array)
-        self.current_player = current_player  # 'black' or 'white'
-        self.parent = parent  # Parent node (None for the root node)
-        self.move = move  # The move that led to this node (row, col)
-        self.children = []  # List of child nodes (future game states)
-        self.visits = 0  # Number of times this node has been visited
-        self.total_score = 0  # Cumulative evaluation score from all simulations
-        self.untried_moves = utils.find_shared_border_cells(board, distance=1)  # List of legal moves from this state
+class MCTSTree:
+    """
+    MCTS tree as a struct of arrays, node 0 is the root.
 
-    def is_fully_expanded(self):
+    Every node is one slot in a pool of preallocated NumPy arrays (visits, total score, parent, move, first / last
+    child, next sibling, player to move, terminal, Zobrist key, ...), the arrays double when they are full, up to
+    `max_capacity` nodes. Slots of evicted subtrees go to a free list and are reused. Only the root board is kept,
+    the board of a node is rebuilt by playing the moves on the path to it. Untried moves live in a dict holding only
+    the nodes that still have some, with their priors when they have any. With a NodeStatsTable, nodes of the same
+    position share their statistics in selection.
+    """
+
+    # Name, dtype and initial value of the node arrays
+    _ARRAYS = (('visits', np.int64, 0),
+               ('scores', np.float64, 0),  # Total rollout score, from the agent's point of view
+               ('parent', np.int32, NO_NODE),  # NO_NODE for the root and for free slots
+               ('move', np.int32, NO_NODE),  # Cell index of the move into the node
+               ('first_child', np.int32, NO_NODE),
+               ('last_child', np.int32, NO_NODE),
+               ('next_sibling', np.int32, NO_NODE),
+               ('player', np.int8, 0),  # Colour code of the player to move
+               ('terminal', bool, False),  # The move into the node completed five
+               ('key', np.uint64, 0),  # Zobrist key of the position
+               ('amaf_visits', np.int64, 0),  # AMAF samples of the move into the node
+               ('amaf_scores', np.float64, 0),
+               ('prior', np.float64, 0),  # Heuristic prior of the move into the node
+               ('child_count', np.int32, 0),
+               ('last_visit', np.int64, 0))  # Simulation that last went through the node
+    NODE_BYTES = sum(np.dtype(dtype).itemsize for _, dtype, _ in _ARRAYS)
+    # Estimates of the untried moves, kept as cell indices: CPython shares the ints below 257, so on boards up to
+    # 16x16 a move is one list slot, a prior is a float and its slot, and every list adds its object, spare slots and
+    # dict entry
+    CELL_BYTES = 8
+    LARGE_CELL_BYTES = 36
+    PRIOR_BYTES = 32
+    LIST_BYTES = 176
+
+    def __init__(self, board, current_player, untried_moves, capacity=INITIAL_CAPACITY, table=None,
+                 untried_priors=None, max_capacity=None):
+        self._allocate(board, capacity, max_capacity, untried_priors is not None)
+        self.table = table
+        code = COLOR_CODES[current_player] if current_player.__class__ is str else current_player
+        self._init_node(NO_NODE, NO_NODE, code, False, self._cells(untried_moves), board.key, untried_priors)
+
+    def _allocate(self, board, capacity, max_capacity, priors):
+        self.board = board.copy()  # Root position
+        self.board_size = board.size
+        self.zobrist = board.zobrist
+        self.max_capacity = max_capacity
+        if max_capacity is not None:
+            capacity = min(capacity, max_capacity)
+        for name, dtype, fill in self._ARRAYS:
+            setattr(self, name, np.full(capacity, fill, dtype=dtype))
+        self.size = 0  # Nodes in use
+        self.used = 0  # Slots ever used, the free ones among them are in `free`
+        self.free = []
+        self.untried = {}  # Node -> cell indices of the moves not expanded yet
+        self.untried_priors = {}  # Node -> priors of its untried moves, for the nodes that have priors
+        self.untried_count = 0  # Untried moves of all nodes
+        self.prior_count = 0  # Priors of untried moves of all nodes
+        self.cell_bytes = self.CELL_BYTES if board.size * board.size <= 257 else self.LARGE_CELL_BYTES
+        self.board_bytes = 2 * self.cell_bytes * board.size ** 2  # The root board and the working copy of a search
+        # Most a new node can add besides its slot: a move list, and a prior list with `priors`, of every empty cell
+        self.priors = priors
+        move_bytes = self.cell_bytes + self.PRIOR_BYTES if priors else self.cell_bytes
+        self.new_node_bytes = (1 + priors) * self.LIST_BYTES + (board.size ** 2 - board.stones) * move_bytes
+        self.clock = 0  # Simulations backpropagated
+        self.evicted = 0  # Nodes evicted
+        self.peak_memory = 0  # Largest memory() seen by track_peak
+        self.peak_size = 0
+
+    def _grow(self):
+        capacity = len(self.visits)
+        new_capacity = 2 * capacity if self.max_capacity is None else min(2 * capacity, self.max_capacity)
+        if new_capacity == capacity:
+            raise MemoryError(f"MCTS node pool is full ({capacity} nodes)")
+        for name, dtype, fill in self._ARRAYS:
+            grown = np.full(new_capacity, fill, dtype=dtype)
+            grown[:capacity] = getattr(self, name)
+            setattr(self, name, grown)
+
+    def _cells(self, moves):
+        size = self.board_size
+        return [row * size + col for row, col in moves] if moves else moves
+
+    def _init_node(self, parent, move_idx, player, terminal, untried_cells, key, untried_priors=None):
+        if self.free:
+            node = self.free.pop()
+            for name, _, fill in self._ARRAYS:
+                getattr(self, name)[node] = fill
+        else:
+            if self.used == len(self.visits):
+                self._grow()
+            node = self.used
+            self.used += 1
+        self.size += 1
+        self.parent[node] = parent
+        self.move[node] = move_idx
+        self.player[node] = player
+        self.terminal[node] = terminal
+        self.key[node] = key
+        if self.table is not None:
+            self.table.register(key)
+        if untried_cells:
+            self.untried[node] = untried_cells
+            self.untried_count += len(untried_cells)
+            if untried_priors is not None:
+                self.untried_priors[node] = untried_priors
+                self.prior_count += len(untried_priors)
+        return node
+
+    def add_node(self, parent, move, player, terminal, untried_moves, prior=0.0, untried_priors=None):
+        """Adds a child of `parent` for `move` (row, col) as its last child and returns its index."""
+        return self._add_child(parent, move[0] * self.board_size + move[1], player, terminal,
+                               self._cells(untried_moves), prior, untried_priors)
+
+    def _add_child(self, parent, move_idx, player, terminal, untried_cells, prior, untried_priors):
+        key = int(self.key[parent]) ^ self.zobrist[self.player[parent]][move_idx]
+        node = self._init_node(parent, move_idx, player, terminal, untried_cells, key, untried_priors)
+        self.prior[node] = prior
+        self.child_count[parent] += 1
+        last = self.last_child[parent]
+        if last == NO_NODE:
+            self.first_child[parent] = node
+        else:
+            self.next_sibling[last] = node
+        self.last_child[parent] = node
+        return node
+
+    def children(self, node):
+        children = []
+        child = self.first_child[node]
+        while child != NO_NODE:
+            children.append(int(child))
+            child = self.next_sibling[child]
+        return children
+
+    def move_of(self, node):
+        return divmod(int(self.move[node]), self.board_size)
+
+    def is_fully_expanded(self, node):
         """Returns True if all legal moves from this state have been expanded."""
-        return len(self.untried_moves) == 0
+        return node not in self.untried
 
-    def best_child(self, exploration_weight=1.41):
+    def pop_untried(self, node):
+        """Removes the last untried move of `node`, returns it with its prior (0 without priors)."""
+        moves = self.untried[node]
+        move = divmod(moves.pop(), self.board_size)
+        self.untried_count -= 1
+        priors = self.untried_priors.get(node)
+        prior = 0.0
+        if priors is not None:
+            prior = priors.pop()
+            self.prior_count -= 1
+        if not moves:
+            del self.untried[node]
+            self.untried_priors.pop(node, None)
+        return move, prior
+
+    def best_child(self, node, exploration_weight=1.41, maximize=True, rave_equivalence=None, prior_weight=None):
         """
         Select the child node with the best UCB1 value, balancing exploration and exploitation.
+        :param maximize: False at the opponent's nodes, where the lowest score for the agent is the best child.
+        :param rave_equivalence: When set, the mean of a child is blended with its AMAF mean, see MCTSAgent.
+        :param prior_weight: When set, adds the progressive bias of the child priors, see MCTSAgent.
         """
-        return max(self.children, key=lambda child: (child.total_score / child.visits) + exploration_weight * (
-            np.sqrt(np.log(self.visits) / child.visits)))
+        children = self.children(node)
+        visits, scores = self.visits[children], self.scores[children]
+        if self.table is not None:
+            visits, scores = self.table.lookup(self.key[children], visits, scores)
+        mean = scores / visits
+        if rave_equivalence is not None:
+            amaf_visits = self.amaf_visits[children]
+            beta = np.where(amaf_visits > 0, np.sqrt(rave_equivalence / (3 * visits + rave_equivalence)), 0.0)
+            mean = (1 - beta) * mean + beta * self.amaf_scores[children] / np.maximum(amaf_visits, 1)
+        ucb = (mean if maximize else -mean) + exploration_weight * np.sqrt(np.log(self.visits[node]) / visits)
+        if prior_weight is not None:
+            scale = np.abs(mean).max() or 1.0
+            ucb += prior_weight * scale * self.prior[children] / (visits + 1)
+        return children[int(np.argmax(ucb))]
+
+    def backpropagate(self, node, result):
+        """Adds the result of a simulation to `node` and every node above it."""
+        self.clock += 1
+        while node != NO_NODE:
+            self.update(node, 1, result)
+            self.last_visit[node] = self.clock
+            node = self.parent[node]
 
-    def expand(self):
+    def update(self, node, visits, score):
+        """Adds to the statistics of `node` and of its position in the table."""
+        self.visits[node] += visits
+        self.scores[node] += score
+        if self.table is not None:
+            self.table.add(int(self.key[node]), visits, score)
+
+    def update_amaf(self, path, rollout_moves, result):
         """
-        Expand the tree by trying an untried move, create a child node.
+        All-moves-as-first update of a simulation: `path` are its tree nodes from the root, `rollout_moves` the
+        (row, col) moves of its rollout. Every child of a path node whose move the player to move there made later
+        in the simulation gets the result as an AMAF sample.
         """
-        move = self.untried_moves.pop()  # Remove the move from the list of untried moves
-        next_board = copy.deepcopy(self.board)
-        MCTSAgent._make_move_on_board(next_board, move[0], move[1], self.current_player)
-
-        # Since we are only saving nodes for your player, the child node is for your next move
-        child_node = MCTSNode(next_board, self.current_player, parent=self, move=move)
-        self.children.append(child_node)
-        return child_node
+        later = {BLACK: [], WHITE: []}  # Cells played after the current path node, by colour
+        code = self.player[path[-1]]
+        for row, col in rollout_moves:
+            later[code].append(row * self.board_size + col)
+            code = opponent_code(code)
+        for node in reversed(path):
+            cells = later[self.player[node]]
+            if cells and self.first_child[node] != NO_NODE:
+                children = np.array(self.children(node))
+                credited = children[np.isin(self.move[children], cells)]
+                self.amaf_visits[credited] += 1
+                self.amaf_scores[credited] += result
+            parent = self.parent[node]
+            if parent != NO_NODE:
+                later[self.player[parent]].append(int(self.move[node]))
 
-    def backpropagate(self, result):
+    def evict(self, count, least_recent=False):
         """
-        Backpropagate the evaluation score from the simulation up the tree.
-        :param result: The evaluation score returned by the evaluation function.
+        Frees at least `count` nodes (fewer when only the root is left) by removing whole subtrees, the least
+        visited first, or the least recently visited with `least_recent`. The move of an evicted subtree goes back to
+        the untried moves of its parent, to be expanded again later. Returns the number of nodes freed.
         """
-        self.visits += 1
-        self.total_score += result  # Update the total score for this node with the evaluation result
-        if self.parent:
-            self.parent.backpropagate(result)
+        candidates = np.flatnonzero(self.parent[:self.used] != NO_NODE)  # Every node in use except the root
+        metric = self.last_visit if least_recent else self.visits
+        freed = 0
+        for node in candidates[np.argsort(metric[candidates], kind='stable')].tolist():
+            if freed >= count:
+                break
+            if self.parent[node] != NO_NODE:  # Not freed with an evicted ancestor already
+                freed += self._evict_subtree(node)
+        self.evicted += freed
+        return freed
 
-    @staticmethod
-    def find_legal_moves_all_board(board):
+    def _evict_subtree(self, node):
+        parent = int(self.parent[node])
+        # Unlink the node from the children of its parent
+        previous, child = NO_NODE, self.first_child[parent]
+        while child != node:
+            previous, child = child, self.next_sibling[child]
+        following = self.next_sibling[node]
+        if previous == NO_NODE:
+            self.first_child[parent] = following
+        else:
+            self.next_sibling[previous] = following
+        if self.last_child[parent] == node:
+            self.last_child[parent] = previous
+        self.child_count[parent] -= 1
+
+        # Its move is expanded again after the parent's other untried moves, with its prior when the tree keeps them
+        has_priors = self.priors and (parent in self.untried_priors or parent not in self.untried)
+        self.untried.setdefault(parent, []).insert(0, int(self.move[node]))
+        if has_priors:
+            self.untried_priors.setdefault(parent, []).insert(0, float(self.prior[node]))
+            self.prior_count += 1
+        self.untried_count += 1
+
+        subtree = [node]
+        for old in subtree:
+            subtree.extend(self.children(old))
+        for old in subtree:
+            self.untried_count -= len(self.untried.pop(old, ()))
+            self.prior_count -= len(self.untried_priors.pop(old, ()))
+            self.parent[old] = NO_NODE
+        self.free.extend(subtree)
+        self.size -= len(subtree)
+        return len(subtree)
+
+    def subtree(self, node, board):
+        """A new tree holding `node` and its descendants, `board` is the position of `node`."""
+        tree = MCTSTree.__new__(MCTSTree)
+        tree._allocate(board, len(self.visits), self.max_capacity, self.priors)
+        tree.table = None  # The positions of the kept nodes are in the table already
+
+        # Breadth first, so every parent gets its new index before its children
+        new_index = {node: tree._init_node(NO_NODE, NO_NODE, self.player[node], self.terminal[node],
+                                           self.untried.get(node), board.key, self.untried_priors.get(node))}
+        queue = [node]
+        for old in queue:
+            for child in self.children(old):
+                new = tree._add_child(new_index[old], int(self.move[child]), self.player[child], self.terminal[child],
+                                      self.untried.get(child), self.prior[child], self.untried_priors.get(child))
+                new_index[child] = new
+                queue.append(child)
+        for old, new in new_index.items():
+            tree.visits[new] = self.visits[old]
+            tree.scores[new] = self.scores[old]
+            tree.amaf_visits[new] = self.amaf_visits[old]
+            tree.amaf_scores[new] = self.amaf_scores[old]
+            tree.last_visit[new] = self.last_visit[old]
+        tree.clock = self.clock  # The kept nodes were visited before the simulations of the next search
+        tree.table = self.table
+        return tree
+
+    def nbytes(self):
+        """Memory of the node arrays, the untried move lists are not counted."""
+        return sum(getattr(self, name).nbytes for name, _, _ in self._ARRAYS)
+
+    def memory(self, extra_nodes=0):
         """
-        Find all legal moves (empty cells) on the board.
+        Estimated memory of the tree in bytes: the allocated node arrays plus the untried move lists. With
+        `extra_nodes`, the most it can take once that many more nodes are added, the node pool grown to hold them.
         """
-        legal_moves = []
-        for row in range(len(board)):
-            for col in range(len(board[0])):
-                if board[row][col] is None:  # Empty cell
-                    legal_moves.append((row, col))
-        return legal_moves
+        capacity = len(self.visits)
+        while capacity < self.size + extra_nodes and capacity != self.max_capacity:
+            capacity = 2 * capacity if self.max_capacity is None else min(2 * capacity, self.max_capacity)
+        lists = len(self.untried) + len(self.untried_priors)
+        return (capacity * self.NODE_BYTES + self.board_bytes + self.untried_count * self.cell_bytes + self.prior_count * self.PRIOR_BYTES
+                + lists * self.LIST_BYTES + extra_nodes * self.new_node_bytes)
+
+    def track_peak(self):
+        self.peak_memory = max(self.peak_memory, self.memory())
+        self.peak_size = max(self.peak_size, self.size)
@@ -0,0 +1,45 @@
+from src.Board import BOARD_SIZE, BLACK, WHITE
+
+KILLER_SLOTS = 2
+
+
+class MoveOrdering:
+    """
+    Killer moves and history heuristic for alpha-beta move ordering.
+
+    The killers of a ply are the last moves that caused a cutoff at that ply, they are often good in the sibling
+    subtrees too. The history table adds depth_left ** 2 to a (cell, colour) every time that move causes a cutoff,
+    so moves that refuted positions anywhere in the tree are searched earlier.
+    """
+
+    def __init__(self, size=BOARD_SIZE, max_ply=64):
+        self.size = size
+        self.killers = [[None] * KILLER_SLOTS for _ in range(max_ply)]
+        self.history = [None, [0] * (size * size), [0] * (size * size)]  # Indexed by colour code, then cell
+
+    def new_search(self):
+        """Clears the killers and halves the history, so older cutoffs weigh less than the ones of this move."""
+        for slots in self.killers:
+            slots[:] = [None] * KILLER_SLOTS
+        for code in (BLACK, WHITE):
+            self.history[code] = [score >> 1 for score in self.history[code]]
+
+    def order(self, moves, ply, code, first=None):
+        """
+        Returns `moves` reordered: `first` (e.g. the transposition table move), the killers of `ply`, the best of the
+        remaining moves in their given (heuristic) order, then the rest by history score. Ties keep their order in
+        `moves`.
+        """
+        head = [first] if first is not None and first in moves else []
+        head += [move for move in self.killers[ply] if move is not None and move in moves and move not in head]
+        rest = [move for move in moves if move not in head]
+        # The heuristic's top move stays ahead of the history, on its own history orders the tail better than the head
+        history, size = self.history[code], self.size
+        return head + rest[:1] + sorted(rest[1:], key=lambda move: -history[move[0] * size + move[1]])
+
+    def record_cutoff(self, move, ply, code, depth_left):
+        slots = self.killers[ply]
+        if slots[0] != move:
+            slots[1:] = slots[:-1]
+            slots[0] = move
+        self.history[code][move[0] * self.size + move[1]] += depth_left * depth_left
@@ -0,0 +1,102 @@
+import random
+
+from src.Agents.AgentsUtils import add_random_noise
+from src.Agents.Frontier import Frontier
+from src.Agents.IncrementalEvaluator import IncrementalEvaluator
+from src.Board import COLOR_CODES, opponent_code
+from src.ThreatIndex import ThreatIndex
+
+HEURISTIC_ROLLOUT = 'heuristic'  # The agent picks among the top mixed_heuristic moves, the opponent plays randomly
+FAST_ROLLOUT = 'fast'  # Both sides win or block when they can and play a random frontier cell otherwise
+
+
+class RolloutEngine:
+    """
+    Fast rollouts on one scratch board.
+
+    The board, its Frontier, a ThreatIndex and an IncrementalEvaluator are built once per search and follow the
+    search with push/pop, so a rollout plays and takes back its moves without copying the board or scanning it. A
+    rollout move completes five when the player has a win spot, blocks the opponent's win spot otherwise, and else
+    is a random frontier cell. The final position is scored by the incremental evaluator, or by `evaluation_fn`
+    when one is given.
+    """
+
+    def __init__(self, board, frontier=None, evaluation_fn=None):
+        """
+        :param board: Scratch board, owned by the engine from now on: play moves on it through push/pop only.
+        :param frontier: Frontier of `board`, built when None.
+        :param evaluation_fn: evaluation_fn(board, color) scoring the final position. None uses the incremental
+                              evaluation with noise, the same value as `AgentsUtils.evaluation_function`.
+        """
+        self.board = board
+        self.frontier = frontier if frontier is not None else Frontier.from_board(board)
+        self.threats = ThreatIndex.from_board(board)
+        self.evaluation_fn = evaluation_fn
+        self.evaluator = IncrementalEvaluator(board) if evaluation_fn is None else None
+
+    def push(self, row, col, code):
+        self.board.make_move(row, col, code)
+        self.frontier.push(row, col, code)
+        self.threats.push(row, col, code)
+        if self.evaluator is not None:
+            self.evaluator.push(row, col, code)
+
+    def pop(self, row, col):
+        self.board.undo_move(row, col)
+        self.frontier.pop()
+        self.threats.pop()
+        if self.evaluator is not None:
+            self.evaluator.pop()
+
+    def rollout(self, player_to_move, agent_color, m_steps, terminal=False):
+        """
+        Plays up to `m_steps` moves from the current position and takes them back. Returns the evaluation of the
+        final position for `agent_color`, 0 when the board fills up.
+        """
+        played = self.playout(player_to_move, m_steps, terminal)
+        if played is None:
+            return 0
+        try:
+            return self.evaluate(agent_color)
+        finally:
+            self.take_back(played)
+
+    def playout(self, player_to_move, m_steps, terminal=False):
+        """
+        Plays up to `m_steps` moves from the current position and leaves them on the board. Returns the moves
+        played, for `take_back`, or None when the board fills up (a draw, the moves are taken back already).
+        """
+        if terminal:
+            return []
+
+        code = COLOR_CODES[player_to_move] if player_to_move.__class__ is str else player_to_move
+        spots = self.threats.spots
+        played = []
+        # Simulate for `m_steps` or until the game ends
+        for _ in range(m_steps):
+            other = opponent_code(code)
+            if spots[code]:
+                move = next(iter(spots[code]))
+                self.push(move[0], move[1], code)
+                played.append(move)
+                break  # Five in a row, the game is over
+            if spots[other]:
+                move = random.choice(list(spots[other]))
+            else:
+                move = self.frontier.choice()
+                if move is None:  # Full board, draw
+                    self.take_back(played)
+                    return None
+            self.push(move[0], move[1], code)
+            played.append(move)
+            code = other
+        return played
+
+    def take_back(self, played):
+        for move in reversed(played):
+            self.pop(move[0], move[1])
+
+    def evaluate(self, agent_color):
+        if self.evaluator is None:
+            return self.evaluation_fn(self.board, agent_color)
+        return add_random_noise(self.evaluator.evaluate(agent_color))
@@ -0,0 +1,232 @@
+from src.Agents.IncrementalEvaluator import IncrementalEvaluator
+from src.Board import as_board, COLOR_CODES, COLORS, EMPTY, opponent_code
+from src.ThreatIndex import ThreatIndex
+
+VCF = 'vcf'  # Victory by continuous fours
+VCT = 'vct'  # Victory by continuous threats, fours and threes
+
+DEFAULT_MAX_NODES = 2000
+DEFAULT_MAX_DEPTH = 10  # Attacker moves
+EXHAUSTED = float('inf')  # Refuted depth of a position whose threats all ran out before the depth limit
+
+# Result of the last search
+WIN = 'win'
+NO_WIN = 'no_win'  # Every threat sequence within max_depth was refuted
+UNKNOWN = 'unknown'  # The node limit was reached first
+
+
+class _NodeLimit(Exception):
+    """Raised when the search visits more than max_nodes positions."""
+
+
+class ThreatSearch:
+    """
+    Threat-space search for a forced win.
+
+    The attacker only plays threats and the defender only answers them: after a four the defender has to take its
+    single win spot, after a three (a move that leaves the attacker a cell making two win spots, an open or double
+    four) the defender may take any empty cell of the windows behind it or play a four of its own. Four windows come
+    from the ThreatIndex five-cell windows, and the moves of every node are tried in the order of their
+    `IncrementalEvaluator` (line scoring) value. A win is proven when every defence of a threat loses, so the
+    search is only as wide as the threats, far narrower than a full-width search of the same depth.
+
+    The depth is deepened iteratively up to `max_depth`, so a short win is found before the node limit is spent on
+    long threat sequences that lead nowhere. The refuted positions are kept from one depth to the next.
+    """
+
+    def __init__(self, mode=VCF, max_nodes=DEFAULT_MAX_NODES, max_depth=DEFAULT_MAX_DEPTH):
+        if mode not in (VCF, VCT):
+            raise ValueError(f"Unknown threat search mode: {mode}")
+        self.mode = mode
+        self.max_nodes = max_nodes
+        self.max_depth = max_depth
+        self.nodes = 0
+        self.status = None
+        self.line = []  # Moves of the last proven win, attacker first, alternating with the defender
+        self.board = self.threats = self.evaluator = None
+        self.attacker = self.defender = None
+        self.refuted = {}  # Board key -> deepest depth it was refuted at (EXHAUSTED: any depth), within one search
+        self.depth_limited = 0  # Positions of the current search cut by the depth limit, refuted ones included
+
+    def find_win(self, board, color):
+        """
+        Returns the first move of a forced win of `color` on `board`, or None when there is none within the limits.
+        `status` tells a refuted search (NO_WIN) from one that ran out of nodes (UNKNOWN).
+        """
+        self.board = as_board(board).copy()
+        self.threats = ThreatIndex.from_board(self.board)
+        self.evaluator = IncrementalEvaluator(self.board)
+        self.attacker = COLOR_CODES[color] if color.__class__ is str else color
+        self.defender = opponent_code(self.attacker)
+        self.nodes = self.depth_limited = 0
+        self.refuted = {}
+        try:
+            line = None
+            for depth in range(1, self.max_depth + 1):
+                limited = self.depth_limited
+                line = self._attack(depth)
+                if line is not None or self.depth_limited == limited:
+                    break  # Won, or every threat sequence was refuted before the depth limit
+            self.status = WIN if line is not None else NO_WIN
+        except _NodeLimit:
+            line = None
+            self.status = UNKNOWN
+        finally:
+            self.board = self.threats = self.evaluator = None
+            self.refuted = {}
+        self.line = line or []
+        return line[0] if line else None
+
+    def _push(self, move, code):
+        self.board.make_move(move[0], move[1], code)
+        self.threats.push(move[0], move[1], code)
+        self.evaluator.push(move[0], move[1], code)
+
+    def _pop(self, move):
+        self.board.undo_move(move[0], move[1])
+        self.threats.pop()
+        self.evaluator.pop()
+
+    def _attack(self, depth):
+        """A winning line for the attacker to move, or None."""
+        self.nodes += 1
+        if self.nodes > self.max_nodes:
+            raise _NodeLimit()
+
+        own = self.threats.win_spots(self.attacker)
+        if own:
+            return [min(own)]
+        theirs = self.threats.win_spots(self.defender)
+        if len(theirs) > 1:
+            return None
+        if depth == 0:
+            self.depth_limited += 1
+            return None
+        key = self.board.key
+        refuted = self.refuted.get(key, -1)
+        if refuted >= depth:
+            if refuted != EXHAUSTED:
+                self.depth_limited += 1
+            return None
+        limited = self.depth_limited
+
+        fours = self._four_moves(self.attacker, self.defender)
+        candidates = list(fours)
+        if self.mode == VCT:
+            candidates += [move for move in self._three_moves(fours) if move not in fours]
+        if theirs:
+            # The defender threatens five, only a block that is also a threat keeps the initiative
+            candidates = [move for move in candidates if move in theirs]
+
+        for move in self._ordered(candidates, fours):
+            self._push(move, self.attacker)
+            line = self._defend(depth)
+            self._pop(move)
+            if line is not None:
+                return [move] + line
+
+        self.refuted[key] = depth if self.depth_limited > limited else EXHAUSTED
+        return None
+
+    def _defend(self, depth):
+        """A winning line for the attacker against every answer to its last threat, or None."""
+        if self.threats.win_spots(self.defender):
+            return None  # The defender completes five first
+        own = self.threats.win_spots(self.attacker)
+        if len(own) > 1:
+            return []  # Two win spots, only one can be blocked
+        if own:
+            replies = list(own)
+        else:
+            replies = self._three_defences()
+            replies += [move for move in self._four_moves(self.defender, self.attacker) if move not in replies]
+
+        first_line = None
+        for reply in replies:
+            self._push(reply, self.defender)
+            line = self._attack(depth - 1)
+            self._pop(reply)
+            if line is None:
+                return None
+            if first_line is None:
+                first_line = [reply] + line
+        return first_line
+
+    def _four_moves(self, code, other):
+        """Cell -> set of the win spots `code` gets by playing it, for every cell that makes a four."""
+        cells, size = self.board.cells, self.board.size
+        counts, other_counts = self.threats.counts[code], self.threats.counts[other]
+        moves = {}
+        for wid, window in enumerate(self.threats.windows):
+            if counts[wid] == 3 and other_counts[wid] == 0:
+                first, second = [divmod(idx, size) for idx in window if cells[idx] == EMPTY]
+                moves.setdefault(first, set()).add(second)
+                moves.setdefault(second, set()).add(first)
+        return moves
+
+    def _new_fours(self, move):
+        """Like `_four_moves` for the attacker, restricted to the windows through `move`."""
+        board = self.board
+        cells, size = board.cells, board.size
+        counts, other_counts = self.threats.counts[self.attacker], self.threats.counts[self.defender]
+        moves = {}
+        for wid in self.threats.cell_windows[move[0] * size + move[1]]:
+            if counts[wid] == 3 and other_counts[wid] == 0:
+                empties = [divmod(idx, size) for idx in self.threats.windows[wid] if cells[idx] == EMPTY]
+                moves.setdefault(empties[0], set()).add(empties[1])
+                moves.setdefault(empties[1], set()).add(empties[0])
+        return moves
+
+    def _three_moves(self, fours):
+        """Cells that leave the attacker a cell making two win spots, `fours` are the attacker's current fours."""
+        cells, size = self.board.cells, self.board.size
+        counts, other_counts = self.threats.counts[self.attacker], self.threats.counts[self.defender]
+        candidates = set()
+        for wid, window in enumerate(self.threats.windows):
+            if counts[wid] == 2 and other_counts[wid] == 0:
+                candidates.update(divmod(idx, size) for idx in window if cells[idx] == EMPTY)
+
+        threes = []
+        for move in candidates:
+            self._push(move, self.attacker)
+            if any(len(spots | fours.get(cell, set())) > 1 for cell, spots in self._new_fours(move).items()):
+                threes.append(move)
+            self._pop(move)
+        return threes
+
+    def _three_defences(self):
+        """
+        Every empty cell of the attacker windows that make up its two-spot cells. All of them, not only those of the
+        last threat's windows, a two-spot cell left from before is a threat as well.
+        """
+        fours = self._four_moves(self.attacker, self.defender)
+        cells, size = self.board.cells, self.board.size
+        counts, other_counts = self.threats.counts[self.attacker], self.threats.counts[self.defender]
+        defences = set()
+        for cell, spots in fours.items():
+            if len(spots) > 1:
+                defences.add(cell)
+                for wid in self.threats.cell_windows[cell[0] * size + cell[1]]:
+                    if counts[wid] == 3 and other_counts[wid] == 0:
+                        defences.update(divmod(idx, size) for idx in self.threats.windows[wid] if cells[idx] == EMPTY)
+        return sorted(defences)
+
+    def _ordered(self, moves, fours):
+        """Moves making two win spots first, then the other fours, then threes, each by the line evaluation."""
+        color = COLORS[self.attacker]
+        scored = []
+        for move in moves:
+            self.evaluator.push(move[0], move[1], self.attacker)
+            score = self.evaluator.evaluate(color)
+            self.evaluator.pop()
+            spots = len(fours.get(move, ()))
+            scored.append((-min(spots, 2), -score, move))
+        scored.sort()
+        return [move for _, _, move in scored]
+
+
+def create_threat_search(mode, max_nodes=DEFAULT_MAX_NODES):
+    """The ThreatSearch of an agent option: None (disabled), 'vcf' or 'vct'."""
+    if not mode:
+        return None
+    return ThreatSearch(mode, max_nodes=max_nodes)
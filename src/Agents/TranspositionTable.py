@@ -0,0 +1,118 @@
+import numpy as np
+
+EXACT = 0
+LOWER_BOUND = 1  # The search failed high, the real score is at least the stored one
+UPPER_BOUND = 2  # The search failed low, the real score is at most the stored one
+
+# Xor-ed into the board key at nodes where the minimizing player is to move
+SIDE_TO_MOVE_KEY = 0x2545F4914F6CDD1D
+
+
+class TranspositionTable:
+    """
+    Fixed-size transposition table indexed by the low bits of a Zobrist key.
+
+    Every slot holds (key, depth, bound type, score, best move, generation). A new entry replaces the one in its slot
+    when the slot is empty, holds an entry from an older search, or the new entry was searched at least as deep.
+    """
+
+    def __init__(self, size_log2=18):
+        self.size = 1 << size_log2
+        self.mask = self.size - 1
+        self.entries = [None] * self.size
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+
+    def new_search(self):
+        """Called once per move, so entries of previous searches lose their priority in the replacement policy."""
+        self.generation += 1
+
+    def probe(self, key):
+        """Returns the entry stored for `key` or None."""
+        entry = self.entries[key & self.mask]
+        if entry is not None and entry[0] == key:
+            self.hits += 1
+            return entry
+        self.misses += 1
+        return None
+
+    def store(self, key, depth, bound, score, move):
+        slot = key & self.mask
+        entry = self.entries[slot]
+        if entry is None or entry[5] != self.generation or entry[0] == key or depth >= entry[1]:
+            self.entries[slot] = (key, depth, bound, score, move, self.generation)
+            self.stores += 1
+
+    def clear(self):
+        self.entries = [None] * self.size
+        self.hits = self.misses = self.stores = 0
+
+    def hit_rate(self):
+        probes = self.hits + self.misses
+        return self.hits / probes if probes else 0.0
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'stores': self.stores, 'hit_rate': self.hit_rate()}
+
+
+class NodeStatsTable:
+    """
+    Fixed-size table of MCTS statistics (visits, total score) per position, indexed by the low bits of a Zobrist key.
+
+    Tree nodes of the same position, reached by different move orders, add their results to one shared entry and
+    select with the pooled statistics. A new position takes over its slot from any other one; the nodes of the
+    evicted position fall back to their own statistics.
+    """
+
+    def __init__(self, size_log2=16):
+        self.size = 1 << size_log2
+        self.mask = self.size - 1
+        self.keys = np.zeros(self.size, dtype=np.uint64)
+        self.occupied = np.zeros(self.size, dtype=bool)
+        self.visits = np.zeros(self.size, dtype=np.int64)
+        self.scores = np.zeros(self.size, dtype=np.float64)
+        self.merges = 0  # New nodes that found their position already visited
+        self.evictions = 0
+
+    def new_search(self):
+        """Called once per move, the counters are per move."""
+        self.merges = self.evictions = 0
+
+    def register(self, key):
+        """Called for every new tree node, with the key (a Python int) of its position."""
+        slot = key & self.mask
+        if self.occupied[slot]:
+            if int(self.keys[slot]) == key:
+                if self.visits[slot] > 0:
+                    self.merges += 1
+                return
+            self.evictions += 1
+        self.keys[slot] = key
+        self.occupied[slot] = True
+        self.visits[slot] = 0
+        self.scores[slot] = 0.0
+
+    def add(self, key, visits, score):
+        slot = key & self.mask
+        if self.occupied[slot] and int(self.keys[slot]) == key:
+            self.visits[slot] += visits
+            self.scores[slot] += score
+
+    def lookup(self, keys, visits, scores):
+        """
+        The pooled (visits, scores) of the positions `keys`, given as a uint64 array with the nodes' own `visits` and
+        `scores`. A node keeps its own statistics when its position was evicted and holds fewer visits since.
+        """
+        slots = (keys & np.uint64(self.mask)).astype(np.intp)
+        pooled = self.occupied[slots] & (self.keys[slots] == keys) & (self.visits[slots] >= visits)
+        return np.where(pooled, self.visits[slots], visits), np.where(pooled, self.scores[slots], scores)
+
+    def clear(self):
+        self.occupied[:] = False
+        self.new_search()
+
+    def stats(self):
+        return {'transpositions': self.merges, 'evictions': self.evictions,
+                'entries': int(np.count_nonzero(self.occupied))}
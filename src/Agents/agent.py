@@ -5,4 +5,7 @@ class Agent(object):
     def make_move(self, game_state):
         return
     def get_type(self):
-        return 'Agent'
\ No newline at end of file
+        return 'Agent'
+
+    def close(self):
+        """Releases what the agent keeps between moves, such as worker processes. Called when its games are over."""
@@ -1,11 +1,19 @@
-from src.Agents.AlphaBetaAgent import AlphaBetaAgent
+from src.Agents.AlphaBetaAgent import AlphaBetaAgent, MAX_ITERATIVE_DEPTH
 from src.Agents.humanagent import HumanAgent
 from src.Agents.multiastaragent import MultiAStarAgent
 from src.Agents.qlearningagent import QLearningAgent
 from src.Agents.randomagent import RandomAgent
 from src.Agents.minimaxagent import MinimaxAgent
 from src.Agents.expectimaxAgent import ExpectimaxAgent
-from src.Agents.MCTSAgent import MCTSAgent
+from src.Agents.MCTSAgent import MCTSAgent, TREE_PARALLEL, LEAST_VISITED
+from src.Agents.RolloutEngine import HEURISTIC_ROLLOUT
+from src.Agents.ThreatSearch import DEFAULT_MAX_NODES
+
+
+def threat_search_kwargs(kwargs):
+    """Threat search options shared by the search agents."""
+    return {'threat_search': kwargs.get('threat_search', None),  # 'vcf', 'vct' or None
+            'threat_nodes': kwargs.get('threat_nodes', DEFAULT_MAX_NODES)}  # Node limit of the threat search
 
 
 class AgentFactory:
@@ -29,15 +37,23 @@ class AgentFactory:
         elif agent_type.lower() == "minimax":
             color = kwargs.get('color', "black")
             depth = kwargs.get('depth', 1)  # Default depth for minimax agent is 1
-            return MinimaxAgent(color, depth=depth)
+            return MinimaxAgent(color, depth=depth, **threat_search_kwargs(kwargs))
         elif agent_type.lower() == "expectimax":
             color = kwargs.get('color', "black")
             depth = kwargs.get('depth', 2)  # Default depth for expectimax agent is 1
-            return ExpectimaxAgent(color, depth=depth)
+            pruning = kwargs.get('pruning', False)  # Star1 / Star2 pruning of the chance nodes, same move either way
+            return ExpectimaxAgent(color, depth=depth, pruning=pruning, **threat_search_kwargs(kwargs))
         elif agent_type.lower() == "alphabeta":
             color = kwargs.get('color', "black")
             depth = kwargs.get('depth', 4)  # Default depth for alphabeta agent is 1
-            return AlphaBetaAgent(color, depth=depth)
+            tt_bits = kwargs.get('tt_bits', 18)  # Transposition table of 2 ** tt_bits entries, 0 disables it
+            time_limit = kwargs.get('time_limit', None)  # Seconds per move, searches by iterative deepening when set
+            max_depth = kwargs.get('max_depth', MAX_ITERATIVE_DEPTH)  # Deepest iteration under a time limit
+            k = kwargs.get('k', 5)  # Moves searched per node
+            move_ordering = kwargs.get('move_ordering', True)  # Killer moves and history heuristic
+            workers = kwargs.get('workers', 1)  # Processes of the root-parallel search
+            return AlphaBetaAgent(color, depth=depth, tt_bits=tt_bits, time_limit=time_limit, max_depth=max_depth, k=k,
+                                  move_ordering=move_ordering, workers=workers, **threat_search_kwargs(kwargs))
         elif agent_type.lower() == "qlearning":
             alpha = kwargs.get('alpha', 0.2)
             gamma = kwargs.get('gamma', 0.9)
@@ -48,6 +64,23 @@ class AgentFactory:
         elif agent_type.lower() == "mcts":
             n_simulations = kwargs.get('n_simulations', 100)
             m_steps = kwargs.get('m_steps', 10)
-            return MCTSAgent(n_simulations=n_simulations, m_steps=m_steps)
+            n_workers = kwargs.get('n_workers', 1)  # Worker processes, 1 runs serially
+            parallel_mode = kwargs.get('parallel_mode', TREE_PARALLEL)  # 'tree' or 'root' parallelism
+            time_limit = kwargs.get('time_limit')  # Seconds per move, replaces n_simulations when set
+            max_nodes = kwargs.get('max_nodes')  # Tree nodes per move
+            rollout_policy = kwargs.get('rollout_policy', HEURISTIC_ROLLOUT)  # 'heuristic' or 'fast' rollouts
+            batch_size = kwargs.get('batch_size', 1)  # Leaves evaluated together, 1 evaluates each on its own
+            transpositions = kwargs.get('transpositions', False)  # Pool the statistics of transposed positions
+            rave = kwargs.get('rave', False)  # Blend all-moves-as-first values into the selection
+            rave_equivalence = kwargs.get('rave_equivalence', 1000)
+            widening = kwargs.get('widening', False)  # Expand the heuristic's best moves first, more as visits grow
+            node_budget = kwargs.get('node_budget')  # Most tree nodes, subtrees are evicted past it
+            memory_budget = kwargs.get('memory_budget')  # Most tree bytes, subtrees are evicted past it
+            eviction = kwargs.get('eviction', LEAST_VISITED)  # 'visits' or 'lru'
+            return MCTSAgent(n_simulations=n_simulations, m_steps=m_steps, n_workers=n_workers,
+                             parallel_mode=parallel_mode, time_limit=time_limit, max_nodes=max_nodes,
+                             rollout_policy=rollout_policy, batch_size=batch_size, transpositions=transpositions,
+                             rave=rave, rave_equivalence=rave_equivalence, widening=widening,
+                             node_budget=node_budget, memory_budget=memory_budget, eviction=eviction)
         else:
             raise ValueError(f"Unknown agent type: {agent_type}")
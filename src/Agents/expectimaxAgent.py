@@ -1,67 +1,188 @@
+import math
+
 from src.Agents import AgentsUtils
+from src.Agents.IncrementalEvaluator import IncrementalEvaluator
+from src.Agents.ThreatSearch import create_threat_search, DEFAULT_MAX_NODES
 from src.Agents.agent import Agent
+from src.Board import as_board
 
 
 class ExpectimaxAgent(Agent):
-    def __init__(self, color, depth=1):
+    def __init__(self, color, depth=1, threat_search=None, threat_nodes=DEFAULT_MAX_NODES, pruning=False):
+        """
+        :param threat_search: 'vcf' or 'vct' looks for a forced win (within `threat_nodes` positions) before the
+                              regular search, None skips it.
+        :param pruning: Star1 / Star2 pruning of the chance nodes whose replies are not leaves, bounded by the values
+                        the evaluation can reach in the plies left (`AgentsUtils.evaluation_change_bounds`). Same
+                        move and value as the full search for the same move lists, but the pruned subtrees draw no
+                        move noise, so a seeded game plays differently.
+        """
         super().__init__()
         self.depth = depth
         self.color = color
+        self.evaluator = None  # Tracks the working board during a search
+        self.threat_search = create_threat_search(threat_search, threat_nodes)
+        self.pruning = pruning
+        self.nodes = 0  # Nodes searched by the last move, Star2 probes included
+        self.cutoffs = 0  # Chance nodes of the last move cut off before averaging all their replies
 
     def get_type(self):
         return 'expectimaxAgent'
 
     def make_move(self, game_state):
-        return self.expectimax(0, game_state['board'], True)[1]
-
-    def expectimax(self, depth, board, maximizingPlayer):
+        # One working board per search, children are played and taken back on it with make/unmake
+        board = as_board(game_state['board']).copy()
+        if self.threat_search is not None:
+            winning_move = self.threat_search.find_win(board, self.color)
+            if winning_move is not None:
+                return winning_move
+        self.evaluator = IncrementalEvaluator(board)
+        self.nodes = self.cutoffs = 0
+        try:
+            return self.expectimax(0, board, True)[1]
+        finally:
+            self.evaluator = None
+
+    def expectimax(self, depth, board, maximizingPlayer, alpha=-math.inf, beta=math.inf):
+        """
+        The value of `board` and its best move, exact when it lies within (alpha, beta). Otherwise the value returned
+        is a bound on the same side of the window: at most alpha, or at least beta.
+        """
+        self.nodes += 1
+        # Leaves are evaluated whatever their moves, so only the noise of the moves is drawn
+        if depth == self.depth:
+            AgentsUtils.skip_move_noise(board)
+            return self.evaluation_function(board), (-1, -1)
 
-        # legal_moves = [(i, j) for i in range(len(board)) for j in range(len(board[0])) if board[i][j] is None]
+        # legal_moves = board.empty_cells()
         legal_moves = AgentsUtils.mixed_heuristic(board, self.color, 5)
 
-        if depth == self.depth or self._no_valid_moves(legal_moves):
+        if self._no_valid_moves(legal_moves):
             return self.evaluation_function(board), (-1, -1)
 
         if maximizingPlayer:
-            return self.max_evaluation(depth, board, legal_moves, maximizingPlayer)
+            return self.max_evaluation(depth, board, legal_moves, maximizingPlayer, alpha, beta)
 
         else:
-            return self.min_evaluation(depth, board, legal_moves, maximizingPlayer)
+            return self.min_evaluation(depth, board, legal_moves, maximizingPlayer, alpha, beta)
 
-    def max_evaluation(self, depth, board, legal_moves, maximizingPlayer):
+    def max_evaluation(self, depth, board, legal_moves, maximizingPlayer, alpha=-math.inf, beta=math.inf,
+                       first_value=None):
+        """:param first_value: Value of the first move, when a Star2 probe searched it already."""
         max_eval = -float('inf')
         max_action = (-1, -1)
+        if first_value is not None:
+            max_eval, max_action = first_value, legal_moves[0]
+            legal_moves = legal_moves[1:]
         for action in legal_moves:
-            board_copy = [row[:] for row in board]
-            board_copy = self._apply_move(board_copy, action, self.color)
-
-            action_run = self.expectimax(depth + 1, board_copy, not maximizingPlayer)
+            if max_eval >= beta:
+                break
+            self._apply_move(board, action, self.color)
+            action_run = self.expectimax(depth + 1, board, not maximizingPlayer, max(alpha, max_eval), beta)
+            self._undo_move(board, action)
 
             if action_run[0] > max_eval:
                 max_eval = action_run[0]
                 max_action = action
         return max_eval, max_action
 
-    def min_evaluation(self, depth, board, legal_moves, maximizingPlayer):
+    def min_evaluation(self, depth, board, legal_moves, maximizingPlayer, alpha=-math.inf, beta=math.inf):
+        # Replies at the last ply are leaves, cheaper to evaluate than to bound, and a full window cuts nothing
+        windowed = alpha > -math.inf or beta < math.inf
+        if self.pruning and self.evaluator is not None and depth + 1 < self.depth and windowed:
+            return self._star_evaluation(depth, board, legal_moves, alpha, beta)
         sum_eval = 0
         min_action = (-1, -1)
         for action in legal_moves:
-            board_copy = [row[:] for row in board]
             other_color = "white" if self.color == "black" else "black"
-            board_copy = self._apply_move(board_copy, action, other_color)
-            action_run = self.expectimax(depth + 1, board_copy, not maximizingPlayer)
+            self._apply_move(board, action, other_color)
+            action_run = self.expectimax(depth + 1, board, not maximizingPlayer)
+            self._undo_move(board, action)
 
             sum_eval += action_run[0]
         return sum_eval / len(legal_moves), min_action
 
+    def _star_evaluation(self, depth, board, legal_moves, alpha, beta):
+        """
+        Chance node with Star1 / Star2 pruning. Every reply value lies within the bounds of the evaluation after the
+        plies left, so once the replies searched leave the average at most alpha even if the rest score the highest
+        bound, or at least beta even if they score the lowest, the node returns that bound without searching the rest
+        (Star1). With a beta below the highest bound, the first move of every reply is searched first (Star2
+        probing): a reply is worth at least the value of its first move, which may already prove the node at least
+        beta, and otherwise gives better lower bounds for the replies not searched yet. The probed moves are not
+        searched again.
+        """
+        plies = self.depth - depth  # The opponent plays first
+        lowest, highest = AgentsUtils.evaluation_change_bounds(board, self.color, plies // 2, (plies + 1) // 2)
+        value = self.evaluation_function(board)
+        lowest, highest = value + lowest, value + highest
+        n = len(legal_moves)
+        other_color = "white" if self.color == "black" else "black"
+        probes = None
+        if beta < highest:
+            probes = [self._probe(depth + 1, board, action, other_color) for action in legal_moves]
+            probed_sum = sum(value for _, value in probes)
+            if probed_sum >= n * beta:
+                self.cutoffs += 1
+                return probed_sum / n, (-1, -1)
+
+        sum_eval = 0
+        for i, action in enumerate(legal_moves):
+            remaining = n - i - 1
+            rest_lowest = remaining * lowest if probes is None else sum(value for _, value in probes[i + 1:])
+            # The window this reply must leave to decide the node whatever the remaining replies score
+            child_alpha = n * alpha - sum_eval - remaining * highest
+            child_beta = n * beta - sum_eval - rest_lowest
+            window = (max(child_alpha, lowest), min(child_beta, highest))
+            self._apply_move(board, action, other_color)
+            if probes is None:
+                value = self.expectimax(depth + 1, board, True, *window)[0]
+            else:
+                moves, first_value = probes[i]
+                if self._no_valid_moves(moves):
+                    value = first_value
+                else:
+                    value = self.max_evaluation(depth + 1, board, moves, True, *window, first_value=first_value)[0]
+            self._undo_move(board, action)
+
+            if remaining and value <= child_alpha:
+                self.cutoffs += 1
+                return (sum_eval + value + remaining * highest) / n, (-1, -1)
+            if remaining and value >= child_beta:
+                self.cutoffs += 1
+                return (sum_eval + value + rest_lowest) / n, (-1, -1)
+            sum_eval += value
+        return sum_eval / n, (-1, -1)
+
+    def _probe(self, depth, board, action, color):
+        """
+        Star2 probe of the max node reached by `action` of `color`: its moves, and the exact value of the first one,
+        a lower bound of the node value (the node value itself when it has no moves).
+        """
+        self.nodes += 1
+        self._apply_move(board, action, color)
+        legal_moves = AgentsUtils.mixed_heuristic(board, self.color, 5)
+        if self._no_valid_moves(legal_moves):
+            value = self.evaluation_function(board)
+        else:
+            self._apply_move(board, legal_moves[0], self.color)
+            value = self.expectimax(depth + 1, board, False)[0]
+            self._undo_move(board, legal_moves[0])
+        self._undo_move(board, action)
+        return legal_moves, value
+
     def _apply_move(self, board, move, symbol):
         r, c = move
-        board[r][c] = symbol
+        board.make_move(r, c, symbol)
+        if self.evaluator is not None:
+            self.evaluator.push(r, c, symbol)
         return board
 
     def _undo_move(self, board, move):
         r, c = move
-        board[r][c] = None
+        board.undo_move(r, c)
+        if self.evaluator is not None:
+            self.evaluator.pop()
 
     def _is_winner(self, board, symbol):
         def check_line(r, c, dr, dc):
@@ -70,15 +191,15 @@ class ExpectimaxAgent(Agent):
             for i in range(5):
                 nr = r + i * dr
                 nc = c + i * dc
-                if 0 <= nr < len(board) and 0 <= nc < len(board[0]) and board[nr][nc] == symbol:
+                if board.in_bounds(nr, nc) and board.get(nr, nc) == symbol:
                     count += 1
                 else:
                     break
             return count == 5
 
-        for r in range(len(board)):
-            for c in range(len(board[0])):
-                if board[r][c] == symbol:
+        for r in range(board.size):
+            for c in range(board.size):
+                if board.get(r, c) == symbol:
                     # Check all directions: right, down, down-right diagonal, down-left diagonal
                     if check_line(r, c, 0, 1) or check_line(r, c, 1, 0) or check_line(r, c, 1, 1) or check_line(r, c, 1,
                                                                                                                 -1):
@@ -92,7 +213,9 @@ class ExpectimaxAgent(Agent):
     def is_free(self, board, place):
         i = place[0]
         j = place[1]
-        return 0 <= i < len(board) and 0 <= j < len(board[0]) and board[i][j] is None
+        return board.in_bounds(i, j) and board.is_empty(i, j)
 
     def evaluation_function(self, board):
+        if self.evaluator is not None:
+            return self.evaluator.evaluate(self.color)
         return AgentsUtils.evaluation_state(board, self.color)
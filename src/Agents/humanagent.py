@@ -16,7 +16,7 @@ class HumanAgent(Agent):
         col = event.x // self.game.cell_size
         row = event.y // self.game.cell_size
 
-        if self.game.board[row][col] is None:
+        if self.game.board.is_empty(row, col):
             self.game.make_move(row, col)
 
     def set_game(self, gomoku):
@@ -1,22 +1,41 @@
 from src.Agents import AgentsUtils
+from src.Agents.IncrementalEvaluator import IncrementalEvaluator
+from src.Agents.ThreatSearch import create_threat_search, DEFAULT_MAX_NODES
 from src.Agents.agent import Agent
+from src.Board import as_board
 
 
 class MinimaxAgent(Agent):
-    def __init__(self, color, depth=1):
+    def __init__(self, color, depth=1, threat_search=None, threat_nodes=DEFAULT_MAX_NODES):
+        """
+        :param threat_search: 'vcf' or 'vct' looks for a forced win (within `threat_nodes` positions) before the
+                              regular search, None skips it.
+        """
         super().__init__()
         self.depth = depth
         self.color = color
+        self.evaluator = None  # Tracks the working board during a search
+        self.threat_search = create_threat_search(threat_search, threat_nodes)
 
     def get_type(self):
         return 'Minimax'
 
     def make_move(self, game_state):
-        return self.minimax(0, game_state['board'], True)[1]
+        # One working board per search, children are played and taken back on it with make/unmake
+        board = as_board(game_state['board']).copy()
+        if self.threat_search is not None:
+            winning_move = self.threat_search.find_win(board, self.color)
+            if winning_move is not None:
+                return winning_move
+        self.evaluator = IncrementalEvaluator(board)
+        try:
+            return self.minimax(0, board, True)[1]
+        finally:
+            self.evaluator = None
 
     def minimax(self, depth, board, maximizingPlayer):
 
-        legal_moves = [(i, j) for i in range(len(board)) for j in range(len(board[0])) if board[i][j] is None]
+        legal_moves = board.empty_cells()
 
         if depth == self.depth or self._no_valid_moves(legal_moves):
             return self.evaluation_function(board), (-1, -1)
@@ -31,10 +50,9 @@ class MinimaxAgent(Agent):
         max_eval = -float('inf')
         max_action = (-1, -1)
         for action in legal_moves:
-            board_copy = [row[:] for row in board]
-            board_copy = self._apply_move(board_copy, action, self.color)
-
-            action_run = self.minimax(depth + 1, board_copy, not maximizingPlayer)
+            self._apply_move(board, action, self.color)
+            action_run = self.minimax(depth + 1, board, not maximizingPlayer)
+            self._undo_move(board, action)
 
             if action_run[0] > max_eval:
                 max_eval = action_run[0]
@@ -45,11 +63,10 @@ class MinimaxAgent(Agent):
         min_eval = float('inf')
         min_action = (-1, -1)
         for action in legal_moves:
-            board_copy = [row[:] for row in board]
             other_color = "white" if self.color == "black" else "black"
-            board_copy = self._apply_move(board_copy, action, other_color)
-
-            action_run = self.minimax(depth + 1, board_copy, not maximizingPlayer)
+            self._apply_move(board, action, other_color)
+            action_run = self.minimax(depth + 1, board, not maximizingPlayer)
+            self._undo_move(board, action)
 
             if action_run[0] < min_eval:
                 min_eval = action_run[0]
@@ -58,12 +75,16 @@ class MinimaxAgent(Agent):
 
     def _apply_move(self, board, move, symbol):
         r, c = move
-        board[r][c] = symbol
+        board.make_move(r, c, symbol)
+        if self.evaluator is not None:
+            self.evaluator.push(r, c, symbol)
         return board
 
     def _undo_move(self, board, move):
         r, c = move
-        board[r][c] = None
+        board.undo_move(r, c)
+        if self.evaluator is not None:
+            self.evaluator.pop()
 
     def _is_winner(self, board, symbol):
         def check_line(r, c, dr, dc):
@@ -72,15 +93,15 @@ class MinimaxAgent(Agent):
             for i in range(5):
                 nr = r + i * dr
                 nc = c + i * dc
-                if 0 <= nr < len(board) and 0 <= nc < len(board[0]) and board[nr][nc] == symbol:
+                if board.in_bounds(nr, nc) and board.get(nr, nc) == symbol:
                     count += 1
                 else:
                     break
             return count == 5
 
-        for r in range(len(board)):
-            for c in range(len(board[0])):
-                if board[r][c] == symbol:
+        for r in range(board.size):
+            for c in range(board.size):
+                if board.get(r, c) == symbol:
                     # Check all directions: right, down, down-right diagonal, down-left diagonal
                     if check_line(r, c, 0, 1) or check_line(r, c, 1, 0) or check_line(r, c, 1, 1) or check_line(r, c, 1,
                                                                                                                 -1):
@@ -94,7 +115,9 @@ class MinimaxAgent(Agent):
     def is_free(self, board, place):
         i = place[0]
         j = place[1]
-        return 0 <= i < len(board) and 0 <= j < len(board[0]) and board[i][j] is None
+        return board.in_bounds(i, j) and board.is_empty(i, j)
 
     def evaluation_function(self, board):
+        if self.evaluator is not None:
+            return self.evaluator.evaluate(self.color)
         return AgentsUtils.evaluation_state(board, self.color)
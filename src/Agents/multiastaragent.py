@@ -1,6 +1,7 @@
 import heapq
 from src.Agents.agent import Agent
 from src.Agents import AgentsUtils
+from src.Board import as_board
 
 
 class QueueNode:
@@ -26,7 +27,7 @@ class MultiAStarAgent(Agent):
         return 'StarMultiHeuristic'
 
     def make_move(self, game_state):
-        board = game_state['board']
+        board = as_board(game_state['board'])
 
         # Apply round-robin heuristic selection
         heuristic = self.heuristics[self.current_heuristic]
@@ -41,7 +42,7 @@ class MultiAStarAgent(Agent):
         start_state = board
         frontier = []
         heapq.heappush(frontier, QueueNode(0, start_state, []))
-        visited = []
+        visited = set()
 
         while frontier:
             cur_queue_node = heapq.heappop(frontier)
@@ -56,7 +57,7 @@ class MultiAStarAgent(Agent):
             if cur_state in visited:
                 continue
 
-            visited.append(cur_state)
+            visited.add(cur_state)
 
             for successor, action, step_cost in self.get_successors(cur_state, player):
                 if successor in visited:
@@ -75,7 +76,7 @@ class MultiAStarAgent(Agent):
             """Check for a sequence of 5 in a row starting from (start_row, start_col)."""
             count = 0
             row, col = start_row, start_col
-            while 0 <= row < len(board) and 0 <= col < len(board[row]) and board[row][col] == player:
+            while board.in_bounds(row, col) and board.get(row, col) == player:
                 count += 1
                 if count == 5:
                     return True
@@ -83,7 +84,7 @@ class MultiAStarAgent(Agent):
                 col += col_dir
             return False
 
-        board_size = len(board)
+        board_size = board.size
 
         for row in range(board_size):
             for col in range(board_size):
@@ -111,16 +112,16 @@ class MultiAStarAgent(Agent):
 
     def get_successors(self, board, player):
         successors = []
-        rows = len(board)
-        cols = len(board[0])
+        rows = board.size
+        cols = board.size
 
         for r in range(rows):
             for c in range(cols):
-                if board[r][c] is None:  # Assuming empty cells are represented by an empty string
+                if board.is_empty(r, c):
                     # Create a copy of the board
-                    new_board = [row[:] for row in board]
+                    new_board = board.copy()
                     # Place the player's mark in the empty cell
-                    new_board[r][c] = player
+                    new_board.make_move(r, c, player)
                     successors.append((new_board, [r, c], self.heuristics[self.current_heuristic](new_board, player)))
                     if self.is_goal_state(board, player):
                         return [new_board, [r, c], 0]
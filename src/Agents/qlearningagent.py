@@ -4,6 +4,7 @@ import numpy as np
 
 from src.Agents import AgentsUtils
 from src.Agents.agent import Agent
+from src.Board import as_board
 LEARNING_MODE = False
 
 
@@ -25,15 +26,15 @@ class QLearningAgent(Agent):
     def make_move(self, game_state):
         """Selects an action using the epsilon-greedy policy."""
 
-        board = game_state['board']
+        board = as_board(game_state['board'])
         state_key = self.get_state_key(board)
 
         if state_key not in self.q_table:
             self.q_table[state_key] = {}
 
-        valid_moves = [(r, c) for r in range(len(board)) for c in range(len(board[0])) if board[r][c] is None]
-        if len(valid_moves) == (len(board) * len(board) - 1):
-            return (4, 4) if board[4][4] is None else valid_moves[0]
+        valid_moves = board.empty_cells()
+        if len(valid_moves) == (board.size * board.size - 1):
+            return (4, 4) if board.is_empty(4, 4) else valid_moves[0]
 
         # Exploit: choose the move with the highest Q-value
         move_q_values = {move: self.q_table[state_key].get(move, self.initial_q_value) for move in valid_moves}
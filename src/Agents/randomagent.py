@@ -1,5 +1,6 @@
 import random
 from src.Agents.agent import Agent
+from src.Board import as_board
 
 
 class RandomAgent(Agent):
@@ -11,8 +12,8 @@ class RandomAgent(Agent):
 
     def make_move(self, game_state):
         """Returns a random valid move."""
-        board = game_state['board']
-        valid_moves = [(r, c) for r in range(len(board)) for c in range(len(board[0])) if board[r][c] is None]
+        board = as_board(game_state['board'])
+        valid_moves = board.empty_cells()
         if valid_moves:
             return random.choice(valid_moves)
         return None
@@ -0,0 +1,185 @@
+import functools
+import random
+
+import numpy as np
+
+BOARD_SIZE = 15
+
+# Cell codes used by the compact board
+EMPTY = 0
+BLACK = 1
+WHITE = 2
+
+COLORS = (None, 'black', 'white')  # cell code -> legacy colour value
+COLOR_CODES = {None: EMPTY, 'black': BLACK, 'white': WHITE}
+
+
+def opponent_code(code):
+    return WHITE if code == BLACK else BLACK
+
+
+@functools.lru_cache(maxsize=None)
+def zobrist_table(size):
+    """Random 64-bit key per colour code and cell. Fixed seed, so keys are stable across runs and processes."""
+    rng = random.Random(0x9E3779B9 + size)
+    return [[0] * (size * size)] + [[rng.getrandbits(64) for _ in range(size * size)] for _ in (BLACK, WHITE)]
+
+
+class Board:
+    """
+    Compact Gomoku board.
+
+    Cells are kept in a flat list of small ints (EMPTY / BLACK / WHITE), and every colour also has a bitmask of its
+    stones, so copying, comparing and hashing a position never touches per-cell strings. `board[row][col]` still
+    returns 'black' / 'white' / None, so code written for the old list-of-lists board keeps working.
+    `key` is the Zobrist hash of the position, updated incrementally by make_move / undo_move.
+    """
+
+    __slots__ = ('size', 'cells', 'masks', 'stones', 'key', 'zobrist')
+
+    def __init__(self, size=BOARD_SIZE):
+        self.size = size
+        self.cells = [EMPTY] * (size * size)
+        self.masks = [0, 0, 0]  # Indexed by cell code, masks[EMPTY] is unused
+        self.stones = 0
+        self.key = 0
+        self.zobrist = zobrist_table(size)
+
+    @classmethod
+    def from_list(cls, rows):
+        """Builds a board from the legacy 2D list of 'black' / 'white' / None."""
+        board = cls(len(rows))
+        for r, row in enumerate(rows):
+            for c, value in enumerate(row):
+                if value is not None:
+                    board.make_move(r, c, value)
+        return board
+
+    def to_list(self):
+        """Returns the board in the legacy 2D list format."""
+        size = self.size
+        return [[COLORS[code] for code in self.cells[r * size:(r + 1) * size]] for r in range(size)]
+
+    def to_array(self):
+        """Returns the board as a (size, size) int8 array of cell codes."""
+        return np.array(self.cells, dtype=np.int8).reshape(self.size, self.size)
+
+    def copy(self):
+        board = Board.__new__(Board)
+        board.size = self.size
+        board.cells = self.cells[:]
+        board.masks = self.masks[:]
+        board.stones = self.stones
+        board.key = self.key
+        board.zobrist = self.zobrist
+        return board
+
+    def get(self, row, col):
+        """Returns 'black', 'white' or None for the given cell."""
+        return COLORS[self.cells[row * self.size + col]]
+
+    def code(self, row, col):
+        return self.cells[row * self.size + col]
+
+    def is_empty(self, row, col):
+        return self.cells[row * self.size + col] == EMPTY
+
+    def in_bounds(self, row, col):
+        return 0 <= row < self.size and 0 <= col < self.size
+
+    def is_full(self):
+        return self.stones == self.size * self.size
+
+    def empty_cells(self):
+        """Returns all empty cells as (row, col) tuples, in row-major order."""
+        size = self.size
+        return [divmod(i, size) for i, code in enumerate(self.cells) if code == EMPTY]
+
+    def make_move(self, row, col, color):
+        """Places a stone of `color` ('black' / 'white' or a cell code) on an empty cell."""
+        code = COLOR_CODES[color] if color.__class__ is str else color
+        idx = row * self.size + col
+        if self.cells[idx] != EMPTY:
+            raise ValueError(f"Cell ({row}, {col}) is already occupied")
+        self.cells[idx] = code
+        self.masks[code] |= 1 << idx
+        self.stones += 1
+        self.key ^= self.zobrist[code][idx]
+
+    def undo_move(self, row, col):
+        """Removes the stone at (row, col), the inverse of `make_move`."""
+        idx = row * self.size + col
+        code = self.cells[idx]
+        if code == EMPTY:
+            return
+        self.cells[idx] = EMPTY
+        self.masks[code] ^= 1 << idx
+        self.stones -= 1
+        self.key ^= self.zobrist[code][idx]
+
+    def set(self, row, col, color):
+        """Legacy style assignment, `color` may be None to clear the cell."""
+        self.undo_move(row, col)
+        if color is not None:
+            self.make_move(row, col, color)
+
+    def __getitem__(self, row):
+        return _BoardRow(self, row)
+
+    def __len__(self):
+        return self.size
+
+    def __iter__(self):
+        return (_BoardRow(self, r) for r in range(self.size))
+
+    def __eq__(self, other):
+        if isinstance(other, Board):
+            return self.masks == other.masks and self.size == other.size
+        return NotImplemented
+
+    def __hash__(self):
+        return self.key
+
+    def __array__(self, dtype=None, copy=None):
+        # Lets legacy code call np.array(board) and get the same object array as with the list format
+        return np.array(self.to_list(), dtype=dtype)
+
+    def __repr__(self):
+        symbols = ('.', 'X', 'O')
+        size = self.size
+        return '\n'.join(''.join(symbols[code] for code in self.cells[r * size:(r + 1) * size]) for r in range(size))
+
+
+class _BoardRow:
+    """Row view returned by `Board.__getitem__`, so `board[row][col]` reads and writes like the old list format."""
+
+    __slots__ = ('board', 'row')
+
+    def __init__(self, board, row):
+        self.board = board
+        self.row = row
+
+    def __getitem__(self, col):
+        board = self.board
+        start = self.row * board.size
+        if isinstance(col, slice):
+            return [COLORS[code] for code in board.cells[start:start + board.size][col]]
+        if col < 0:
+            col += board.size
+        return COLORS[board.cells[start + col]]
+
+    def __setitem__(self, col, color):
+        self.board.set(self.row, col, color)
+
+    def __len__(self):
+        return self.board.size
+
+    def __iter__(self):
+        return iter(self[:])
+
+
+def as_board(board):
+    """Adapter that accepts either a Board or the legacy 2D list and always returns a Board."""
+    if isinstance(board, Board):
+        return board
+    return Board.from_list(board)
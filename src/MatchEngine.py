@@ -0,0 +1,330 @@
+import argparse
+import copy
+import json
+import multiprocessing
+import os
+import random
+from datetime import datetime
+
+import numpy as np
+
+from src.Board import Board
+from src.ThreatIndex import ThreatIndex
+
+NUMER_OF_GAMES = 50
+
+
+class MatchEngine:
+    """
+    A single Gomoku game without any graphics: board, turn order, win/draw detection and the per-game statistics.
+    AI-vs-AI games are played with `play()` in a plain loop, the Tk `Gomoku` window is a viewer built on top of it.
+    """
+
+    def __init__(self, black_agent, white_agent, collect_data=True, board_size=15):
+
+        self.collect_data = collect_data
+        self.missed_opportunities_black = 0
+        self.missed_opportunities_white = 0
+        self.blocks_by_black = 0
+        self.blocks_by_white = 0
+        self.steps_by_black = 0
+        self.steps_by_white = 0
+        self.winner = None  # Track the winner of the game
+
+        self.board_size = board_size
+        self.board = Board(self.board_size)
+        self.threats = ThreatIndex(self.board_size)  # Open "four plus one empty" windows, kept up to date per move
+        self.current_player = 'black'
+        self.game_over = False
+
+        self.black_agent = black_agent
+        self.white_agent = white_agent
+
+    def make_move(self, row, col):
+        """Places the stone for the current player and checks for a win. Returns False if the cell is taken."""
+        if not self.board.is_empty(row, col):
+            return False
+
+        if self.current_player == 'black':
+            self.board.make_move(row, col, 'black')
+            self.threats.push(row, col, 'black')
+            self.steps_by_black += 1
+            self.current_player = 'white'
+        else:
+            self.board.make_move(row, col, 'white')
+            self.threats.push(row, col, 'white')
+            self.steps_by_white += 1
+            self.current_player = 'black'
+
+        if self.check_win(row, col) or self.board.is_full():
+            self.game_over = True
+        return True
+
+    def get_valid_moves(self):
+        """Returns a list of valid moves (empty cells) on the board."""
+        return self.board.empty_cells()
+
+    def current_agent(self):
+        return self.black_agent if self.current_player == 'black' else self.white_agent
+
+    def get_game_state(self):
+        """The game state handed to the agents."""
+        return {'board': self.board,
+                'game': self,
+                'current_player': self.current_player,
+                'opponent': self.white_agent if self.current_player == 'black' else self.black_agent}
+
+    def play_agent_turn(self):
+        """Asks the current agent for a move, tracks the opportunities and plays it. Returns the move."""
+        move = self.current_agent().make_move(self.get_game_state())
+
+        if self.collect_data:
+            # Check for missed win and blocks for the current player
+            self.track_opportunities(self.current_player, move[0], move[1])
+
+        self.make_move(move[0], move[1])
+        return move
+
+    def play(self):
+        """Plays the whole game between two AI agents in a plain loop."""
+        if self.black_agent.get_type() == 'Human' or self.white_agent.get_type() == 'Human':
+            raise ValueError("Headless games can't be played by a human agent")
+
+        while not self.game_over:
+            player = self.current_player
+            move = self.play_agent_turn()
+            if self.current_player == player:
+                raise ValueError(f"{self.current_agent().get_type()} played an occupied cell {move}")
+        return self.winner
+
+    def check_win(self, row, col):
+        """Checks if the current move leads to a win."""
+        directions = [(1, 0), (0, 1), (1, 1), (1, -1)]  # Horizontal, Vertical, Diagonal, Anti-diagonal
+        player = self.board.get(row, col)
+
+        for dr, dc in directions:
+            count = 1
+            for i in range(1, 5):
+                r, c = row + dr * i, col + dc * i
+                if 0 <= r < self.board_size and 0 <= c < self.board_size and self.board.get(r, c) == player:
+                    count += 1
+                else:
+                    break
+
+            for i in range(1, 5):
+                r, c = row - dr * i, col - dc * i
+                if 0 <= r < self.board_size and 0 <= c < self.board_size and self.board.get(r, c) == player:
+                    count += 1
+                else:
+                    break
+
+            if count >= 5:
+                if self.collect_data:
+                    self.winner = player
+
+                return True
+        return False
+
+    def track_opportunities(self, player, row, col):
+        """Track missed win opportunities and blocks, using the spots kept by the threat index."""
+        opponent = 'white' if player == 'black' else 'black'
+        opponent_win_spots = self.threats.win_spots(opponent)
+
+        # Check if the current move (row, col) is blocking an opponent win
+        if player == 'black':
+            if (row, col) not in opponent_win_spots and opponent_win_spots:
+                self.missed_opportunities_black += 1  # Increment for black if it didn’t block an opportunity
+            elif (row, col) in opponent_win_spots:
+                self.blocks_by_black += 1  # Increment for black if it blocked an opportunity
+        else:
+            if (row, col) not in opponent_win_spots and opponent_win_spots:
+                self.missed_opportunities_white += 1  # Increment for white if it didn’t block an opportunity
+            elif (row, col) in opponent_win_spots:
+                self.blocks_by_white += 1  # Increment for white if it blocked an opportunity
+
+    def find_potential_win_spots(self, opponent):
+        """
+        Find all spots where placing a stone would complete a continuous five-in-a-row for the opponent.
+        This is the full-board scan the threat index replaces, kept as a reference for it.
+        """
+        potential_win_spots = []
+
+        # Check rows
+        for r in range(self.board_size):
+            for c in range(self.board_size - 4):
+                line = [self.board.get(r, c + i) for i in range(5)]
+                if self.is_valid_continuous_sequence(line, opponent):
+                    empty_spot = line.index(None)
+                    potential_win_spots.append((r, c + empty_spot))
+
+        # Check columns
+        for c in range(self.board_size):
+            for r in range(self.board_size - 4):
+                line = [self.board.get(r + i, c) for i in range(5)]
+                if self.is_valid_continuous_sequence(line, opponent):
+                    empty_spot = line.index(None)
+                    potential_win_spots.append((r + empty_spot, c))
+
+        # Check diagonals (top-left to bottom-right)
+        for r in range(self.board_size - 4):
+            for c in range(self.board_size - 4):
+                line = [self.board.get(r + i, c + i) for i in range(5)]
+                if self.is_valid_continuous_sequence(line, opponent):
+                    empty_spot = line.index(None)
+                    potential_win_spots.append((r + empty_spot, c + empty_spot))
+
+        # Check anti-diagonals (bottom-left to top-right)
+        for r in range(4, self.board_size):
+            for c in range(self.board_size - 4):
+                line = [self.board.get(r - i, c + i) for i in range(5)]
+                if self.is_valid_continuous_sequence(line, opponent):
+                    empty_spot = line.index(None)
+                    potential_win_spots.append((r - empty_spot, c + empty_spot))
+
+        return potential_win_spots
+
+    def is_valid_continuous_sequence(self, line, opponent):
+        """
+        Checks if the given line contains exactly four continuous opponent stones and one None.
+        """
+        if line.count(opponent) == 4 and line.count(None) == 1:
+            if line[0] is None or line[1] is None or line[2] is None or line[3] is None or line[4] is None:
+                return True
+            else:
+                return False
+        return False
+
+    def get_result(self, game_number):
+        """The record saved for this game in the results JSON."""
+        return {
+            'game_number': game_number,
+            'winner': self.winner if self.winner is not None else 'Draw',
+            'winner_type': self.black_agent.get_type() if self.winner == 'black' else self.white_agent.get_type(),
+            'missed_opportunities_black': self.missed_opportunities_black,
+            'missed_opportunities_white': self.missed_opportunities_white,
+            'blocks_by_black': self.blocks_by_black,
+            'blocks_by_white': self.blocks_by_white,
+            'steps_by_black': self.steps_by_black,
+            'steps_by_white': self.steps_by_white}
+
+
+def new_results(black_agent, white_agent):
+    return {
+        'black_player': black_agent.get_type(),
+        'white_player': white_agent.get_type(),
+        'games': []  # List to store individual game results
+    }
+
+
+def play_games(black_agent, white_agent, n=NUMER_OF_GAMES, collect_data=True):
+    """Plays `n` headless games between two AI agents and returns the results in the results JSON layout."""
+    results = new_results(black_agent, white_agent)
+
+    try:
+        for i in range(n):
+            print(f'-DEBUG- Game: {i + 1}')
+            game = MatchEngine(black_agent, white_agent, collect_data=collect_data)
+            game.play()
+
+            # Save the game result after each game
+            if collect_data:
+                results['games'].append(game.get_result(i + 1))
+    finally:
+        close_agents(black_agent, white_agent)
+
+    return results
+
+
+def close_agents(*agents):
+    """Stops the worker processes the agents started, they start new ones if they play again."""
+    for agent in agents:
+        agent.close()
+
+
+# Agents of the current worker process, set once by _init_worker so they are not pickled for every game. They are
+# never played: every game gets fresh copies, so no search state (tables, reused trees) leaks into the next game
+_worker_agents = None
+
+
+def _init_worker(black_agent, white_agent, collect_data, seed):
+    global _worker_agents
+    _worker_agents = (black_agent, white_agent, collect_data, seed)
+
+
+def _play_worker_game(game_number):
+    black_agent, white_agent, collect_data, seed = _worker_agents
+    black_agent, white_agent = copy.deepcopy((black_agent, white_agent))
+
+    # Every game gets its own seed and fresh agents, so a batch is reproducible no matter which worker plays which game
+    random.seed(seed + game_number)
+    np.random.seed((seed + game_number) % 2 ** 32)
+
+    game = MatchEngine(black_agent, white_agent, collect_data=collect_data)
+    game.play()
+    return game.get_result(game_number)
+
+
+def play_games_parallel(black_agent, white_agent, n=NUMER_OF_GAMES, collect_data=True, workers=None, seed=None):
+    """
+    Plays `n` headless games spread over a pool of `workers` processes (all cores by default).
+    Finished games are streamed back as they end, and the results keep the layout of `play_games`.
+    The games already use every worker, so agents with worker processes of their own (AlphaBeta `workers`, MCTS
+    `n_workers`) search serially inside them: a pool worker can't start processes.
+    """
+    workers = workers or os.cpu_count()
+    seed = seed if seed is not None else random.randrange(2 ** 32)
+    results = new_results(black_agent, white_agent)
+
+    try:
+        with multiprocessing.Pool(processes=min(workers, n) or 1, initializer=_init_worker,
+                                  initargs=(black_agent, white_agent, collect_data, seed)) as pool:
+            for finished, result in enumerate(pool.imap_unordered(_play_worker_game, range(1, n + 1)), start=1):
+                print(f'-DEBUG- Game: {result["game_number"]} finished ({finished}/{n})')
+                if collect_data:
+                    results['games'].append(result)
+    finally:
+        close_agents(black_agent, white_agent)
+
+    results['games'].sort(key=lambda game: game['game_number'])
+    return results
+
+
+def save_results(results, black_agent, white_agent, n):
+    filename = get_filename(black_agent, n, white_agent)
+    os.makedirs(os.path.dirname(filename), exist_ok=True)
+    with open(filename, 'w') as file:
+        json.dump(results, file, indent=4)
+    print(f"Results saved to {filename}")
+    return filename
+
+
+def get_filename(black_agent, n, white_agent):
+    return (f"game_logs/gomoku_results_{datetime.now().strftime('%d')}_{datetime.now().strftime('%m')}_"
+            f"{datetime.now().strftime('%Y')}_{datetime.now().strftime('%H')}_{datetime.now().strftime('%M')}_"
+            f"B{black_agent.get_type()}_W{white_agent.get_type()}_n_{n}.json")
+
+
+if __name__ == "__main__":
+    from src.Agents.agentsFactory import AgentFactory
+
+    parser = argparse.ArgumentParser(description="Play AI-vs-AI Gomoku games without a display.")
+    parser.add_argument('black', help="Black agent type, e.g. 'mcts' or 'alphabeta'")
+    parser.add_argument('white', help="White agent type")
+    parser.add_argument('-n', type=int, default=NUMER_OF_GAMES, help="Number of games to play")
+    parser.add_argument('--workers', type=int, default=1, help="Worker processes, 0 uses every core")
+    parser.add_argument('--seed', type=int, default=None, help="Base RNG seed of a parallel batch")
+    parser.add_argument('--time-limit', type=float, default=None,
+                        help="Seconds per move for the agents that support a time budget (alphabeta, mcts)")
+    parser.add_argument('--threat-search', choices=('vcf', 'vct'), default=None,
+                        help="Search agents look for a forced win by continuous fours (vcf) or threats (vct) first")
+    args = parser.parse_args()
+
+    black = AgentFactory.create_agent(args.black, color="black", time_limit=args.time_limit,
+                                      threat_search=args.threat_search)
+    white = AgentFactory.create_agent(args.white, color="white", time_limit=args.time_limit,
+                                      threat_search=args.threat_search)
+    if args.workers == 1:
+        results = play_games(black, white, n=args.n)
+    else:
+        results = play_games_parallel(black, white, n=args.n, workers=args.workers, seed=args.seed)
+    save_results(results, black, white, args.n)
@@ -0,0 +1,105 @@
+import functools
+
+from src.Board import BOARD_SIZE, COLOR_CODES, EMPTY, opponent_code
+
+
+@functools.lru_cache(maxsize=None)
+def five_windows(size):
+    """
+    Every window of 5 consecutive cells (rows, columns, diagonals and anti-diagonals) as a tuple of cell indices,
+    plus for every cell the ids of the windows that go through it.
+    """
+    windows = []
+    for r in range(size):
+        for c in range(size):
+            for dr, dc in ((0, 1), (1, 0), (1, 1), (-1, 1)):
+                end_r, end_c = r + 4 * dr, c + 4 * dc
+                if 0 <= end_r < size and 0 <= end_c < size:
+                    windows.append(tuple((r + i * dr) * size + c + i * dc for i in range(5)))
+
+    cell_windows = [[] for _ in range(size * size)]
+    for wid, window in enumerate(windows):
+        for idx in window:
+            cell_windows[idx].append(wid)
+    return tuple(windows), tuple(tuple(wids) for wids in cell_windows)
+
+
+class ThreatIndex:
+    """
+    Incremental index of the "four plus one empty" windows of both colours.
+
+    A window is a four of a colour when it holds four of its stones and one empty cell, that empty cell is a spot
+    where the colour wins on its next move. Only the windows through the changed cell are updated on push/pop, so
+    asking for the win spots of a colour costs O(1) instead of a scan of the whole board.
+    """
+
+    def __init__(self, size=BOARD_SIZE):
+        self.size = size
+        self.cells = [EMPTY] * (size * size)
+        self.windows, self.cell_windows = five_windows(size)
+        self.counts = [None, [0] * len(self.windows), [0] * len(self.windows)]  # Stones per window, by colour code
+        self.spots = [None, {}, {}]  # Colour code -> {(row, col): number of fours completed on that cell}
+        self.window_spot = {}  # Window id -> (colour code, empty cell) for the windows that are currently fours
+        self.history = []
+
+    @classmethod
+    def from_board(cls, board):
+        index = cls(board.size)
+        for idx, code in enumerate(board.cells):
+            if code != EMPTY:
+                index.push(idx // board.size, idx % board.size, code)
+        index.history = []
+        return index
+
+    def push(self, row, col, color):
+        """Updates the index after a stone of `color` is placed on (row, col)."""
+        code = COLOR_CODES[color] if color.__class__ is str else color
+        idx = row * self.size + col
+        self.cells[idx] = code
+        self._update(idx, code, 1)
+        self.history.append(idx)
+
+    def pop(self):
+        """Reverts the last push."""
+        idx = self.history.pop()
+        code = self.cells[idx]
+        self.cells[idx] = EMPTY
+        self._update(idx, code, -1)
+
+    def _update(self, idx, code, delta):
+        other = opponent_code(code)
+        counts, other_counts = self.counts[code], self.counts[other]
+        for wid in self.cell_windows[idx]:
+            if wid in self.window_spot:
+                self._remove_four(wid)
+            counts[wid] += delta
+            if counts[wid] == 4 and other_counts[wid] == 0:
+                self._add_four(wid, code)
+            elif other_counts[wid] == 4 and counts[wid] == 0:
+                self._add_four(wid, other)
+
+    def _add_four(self, wid, code):
+        size = self.size
+        for idx in self.windows[wid]:
+            if self.cells[idx] == EMPTY:
+                spot = (idx // size, idx % size)
+                break
+        self.window_spot[wid] = (code, spot)
+        spots = self.spots[code]
+        spots[spot] = spots.get(spot, 0) + 1
+
+    def _remove_four(self, wid):
+        code, spot = self.window_spot.pop(wid)
+        spots = self.spots[code]
+        if spots[spot] == 1:
+            del spots[spot]
+        else:
+            spots[spot] -= 1
+
+    def win_spots(self, color):
+        """The cells where `color` completes five on its next move, as a dict keyed by (row, col)."""
+        return self.spots[COLOR_CODES[color] if color.__class__ is str else color]
+
+    def has_four(self, color):
+        return len(self.win_spots(color)) > 0
+
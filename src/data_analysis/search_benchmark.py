@@ -0,0 +1,97 @@
+import argparse
+import os
+import random
+import time
+
+from src.Agents.AlphaBetaAgent import AlphaBetaAgent
+from src.Agents.IncrementalEvaluator import IncrementalEvaluator
+from src.Board import Board, BOARD_SIZE
+
+
+def benchmark_positions(n=20, seed=0, size=BOARD_SIZE):
+    """
+    A fixed set of `n` middle-game positions with black to move: 8 to 30 stones played in a cluster around the
+    centre. Every position has its own seed, so a set is the same on every run and machine.
+    """
+    positions = []
+    for i in range(n):
+        rng = random.Random(seed + i)
+        board = Board(size)
+        stones = 2 * rng.randint(4, 15)
+        r = c = size // 2
+        color = 'black'
+        while board.stones < stones:
+            r = min(size - 1, max(0, r + rng.randint(-2, 2)))
+            c = min(size - 1, max(0, c + rng.randint(-2, 2)))
+            if board.is_empty(r, c):
+                board.make_move(r, c, color)
+                color = 'white' if color == 'black' else 'black'
+        positions.append(board)
+    return positions
+
+
+def run_agent(agent, positions, seed=0):
+    """Plays every position once, returns (seconds, nodes, moves)."""
+    seconds, nodes, moves = 0.0, 0, []
+    for i, board in enumerate(positions):
+        random.seed(seed + i)
+        start = time.perf_counter()
+        moves.append(agent.make_move({'board': board, 'current_player': 'black'}))
+        seconds += time.perf_counter() - start
+        nodes += agent.nodes
+    return seconds, nodes, moves
+
+
+def root_move_score(board, move, depth, **agent_kwargs):
+    """The score for black of playing `move` on `board`, searched to `depth` by one process with a full window."""
+    agent = AlphaBetaAgent('black', depth=depth, tt_bits=0, **agent_kwargs)
+    board = board.copy()
+    board.make_move(move[0], move[1], 'black')
+    agent.evaluator = IncrementalEvaluator(board)
+    return agent.alpha_beta(1, board, False, -float('inf'), float('inf'))[0]
+
+
+def parallel_speedup(workers, depth=4, n=20, seed=0, **agent_kwargs):
+    """
+    Searches the benchmark positions with 1 and with `workers` processes and returns the timings and speedup. The
+    searches run without move noise, the worker processes would draw it from other seeds, so both play the same
+    move or, where root moves tie, moves of the same score. Raises RuntimeError otherwise.
+    """
+    positions = benchmark_positions(n, seed)
+    single = AlphaBetaAgent('black', depth=depth, workers=1, noise=False, **agent_kwargs)
+    parallel = AlphaBetaAgent('black', depth=depth, workers=workers, noise=False, **agent_kwargs)
+    try:
+        parallel._get_pool()  # Start the workers before the clock runs
+        single_seconds, single_nodes, single_moves = run_agent(single, positions, seed)
+        parallel_seconds, parallel_nodes, parallel_moves = run_agent(parallel, positions, seed)
+    finally:
+        parallel.close()
+    for i, (board, single_move, parallel_move) in enumerate(zip(positions, single_moves, parallel_moves)):
+        # Workers finish in any order, the first of tied root moves to raise the shared alpha is played
+        if single_move != parallel_move and root_move_score(board, single_move, depth, noise=False, **agent_kwargs) \
+                != root_move_score(board, parallel_move, depth, noise=False, **agent_kwargs):
+            raise RuntimeError(f"Position {i}: the parallel search played {parallel_move}, a worse move than "
+                               f"{single_move}")
+    return {'positions': n, 'depth': depth, 'workers': workers, 'cores': os.cpu_count(),
+            'single_seconds': single_seconds, 'single_nodes': single_nodes,
+            'parallel_seconds': parallel_seconds, 'parallel_nodes': parallel_nodes,
+            'speedup': single_seconds / parallel_seconds if parallel_seconds else 0.0,
+            'same_moves': sum(a == b for a, b in zip(single_moves, parallel_moves))}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Speedup of the root-parallel AlphaBeta search over one process.")
+    parser.add_argument('--workers', type=int, default=0, help="Worker processes, 0 uses every core")
+    parser.add_argument('--depth', type=int, default=4, help="Search depth")
+    parser.add_argument('-k', type=int, default=5, help="Moves searched per node")
+    parser.add_argument('-n', type=int, default=20, help="Number of benchmark positions")
+    parser.add_argument('--seed', type=int, default=0, help="Seed of the position set")
+    args = parser.parse_args()
+
+    result = parallel_speedup(args.workers or os.cpu_count(), depth=args.depth, n=args.n, seed=args.seed, k=args.k)
+    print(f"{result['positions']} positions, depth {result['depth']}, {result['workers']} workers on "
+          f"{result['cores']} cores")
+    print(f"single:   {result['single_seconds']:.2f}s, {result['single_nodes']} nodes")
+    print(f"parallel: {result['parallel_seconds']:.2f}s, {result['parallel_nodes']} nodes")
+    print(f"speedup:  {result['speedup']:.2f}x on {result['cores']} cores, same move in {result['same_moves']}/"
+          f"{result['positions']} positions, a move of the same score in the others")
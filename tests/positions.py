@@ -0,0 +1,23 @@
+import random
+
+from src.Board import Board
+
+
+def clustered_position(rng, stones, size=15):
+    """A Board of `stones` alternating stones, black first, placed by a random walk around the centre."""
+    board = Board(size)
+    row = col = size // 2
+    colors = ('black', 'white')
+    placed = 0
+    while placed < stones:
+        row = min(size - 1, max(0, row + rng.randint(-2, 2)))
+        col = min(size - 1, max(0, col + rng.randint(-2, 2)))
+        if board.is_empty(row, col):
+            board.make_move(row, col, colors[placed % 2])
+            placed += 1
+    return board
+
+
+def clustered_positions(count, min_stones=2, max_stones=40, seed=0, size=15):
+    rng = random.Random(seed)
+    return [clustered_position(rng, rng.randint(min_stones, max_stones), size) for _ in range(count)]
@@ -0,0 +1,69 @@
+import random
+
+import numpy as np
+import pytest
+
+from src.Agents import AgentsUtils
+from src.Board import Board
+from positions import clustered_positions
+
+
+def reference_mixed_heuristic(board, player_color, k):
+    """`mixed_heuristic` as written before it was vectorized, from the per-cell heuristics."""
+    n = len(board)
+    offensive_scores = AgentsUtils.offensive_heuristic(board, player_color)
+    defensive_scores = AgentsUtils.defensive_heuristic(board, player_color)
+    neighbor_scores, empty_board = AgentsUtils.neighbors_heuristic(board)
+    if empty_board:
+        return [(int(n / 2), int(n / 2))]
+    combined_scores = [[(offensive_scores[i][j] + defensive_scores[i][j]) * neighbor_scores[i][j]
+                        for j in range(n)] for i in range(n)]
+    return AgentsUtils.get_top_k_moves(combined_scores, k)
+
+
+def reference_evaluate_color(board, color, current_color):
+    """`evaluate_color` as written before the line tables, evaluate_line over every row, column and diagonal."""
+    board = board.to_list()
+    size = len(board)
+    current = color == current_color
+    evaluation = 0
+    for i in range(size):
+        evaluation += AgentsUtils.evaluate_line([board[i][j] for j in range(size)], color, current)
+        evaluation += AgentsUtils.evaluate_line([board[j][i] for j in range(size)], color, current)
+    for i in range(-size + 5, size - 4):
+        evaluation += AgentsUtils.evaluate_line(np.diag(board, k=i), color, current)
+        evaluation += AgentsUtils.evaluate_line(np.diag(np.fliplr(board), k=i), color, current)
+    return evaluation
+
+
+def reference_evaluation_state(board, current_color):
+    black_total_score = reference_evaluate_color(board, 'black', current_color) - \
+                        reference_evaluate_color(board, 'white', current_color)
+    return black_total_score if current_color == 'black' else -black_total_score
+
+
+POSITIONS = [Board()] + clustered_positions(30, seed=1) + clustered_positions(5, max_stones=60, seed=2, size=9)
+
+
+@pytest.mark.parametrize('k', [1, 5, 20])
+@pytest.mark.parametrize('color', ['black', 'white'])
+def test_mixed_heuristic_matches_the_reference(color, k):
+    for seed, board in enumerate(POSITIONS):
+        # Both draw the noise of the candidate cells in row-major order
+        random.seed(seed)
+        expected = reference_mixed_heuristic(board, color, k)
+        random.seed(seed)
+        assert AgentsUtils.mixed_heuristic(board, color, k) == expected, board
+
+
+@pytest.mark.parametrize('color', ['black', 'white'])
+def test_evaluation_state_matches_the_reference(color):
+    expected = [reference_evaluation_state(board, color) for board in POSITIONS]
+    assert [AgentsUtils.evaluation_state(board, color) for board in POSITIONS] == expected
+    same_size = [board for board in POSITIONS if board.size == 15]
+    assert [int(score) for score in AgentsUtils.evaluation_states(same_size, color)] == \
+           [reference_evaluation_state(board, color) for board in same_size]
+
+
+def test_line_tables_match_evaluate_line():
+    assert AgentsUtils.check_line_tables() == sum(3 ** length for length in range(1, 11))
@@ -0,0 +1,105 @@
+import os
+
+import pytest
+
+from src.Agents import AgentsUtils
+from src.Agents.AlphaBetaAgent import AlphaBetaAgent
+from src.Agents.IncrementalEvaluator import IncrementalEvaluator
+from src.Agents.MoveOrdering import MoveOrdering
+from src.Board import BLACK, WHITE
+from src.data_analysis.search_benchmark import parallel_speedup
+from positions import clustered_positions
+
+
+@pytest.fixture
+def no_noise(monkeypatch):
+    # The move lists are drawn with noise, the same lists make the searches comparable
+    monkeypatch.setattr(AgentsUtils, 'add_random_noise', int)
+
+
+def search(agent, board):
+    """The root value and move of a fixed depth `agent`, the way make_move searches."""
+    board = board.copy()
+    if agent.ordering is not None:
+        agent.ordering.new_search()
+    agent.evaluator = IncrementalEvaluator(board)
+    try:
+        return agent.search_root(board)
+    finally:
+        agent.evaluator = None
+
+
+def test_deadline_plays_the_last_completed_depth():
+    for color in ['black', 'white']:
+        for board in clustered_positions(4, min_stones=6, seed=4):
+            agent = AlphaBetaAgent(color, time_limit=60)
+            completed = []
+            depth_3_nodes = []
+            search_root, alpha_beta = agent.search_root, agent.alpha_beta
+
+            def recording_search_root(board):
+                result = search_root(board)
+                completed.append((agent.search_depth, result[1]))
+                return result
+
+            def expiring_alpha_beta(depth, board, *args):
+                if agent.search_depth == 3:
+                    depth_3_nodes.append(depth)
+                    if len(depth_3_nodes) > 20:
+                        agent.deadline = 0.0  # The time runs out in the middle of the depth 3 search
+                return alpha_beta(depth, board, *args)
+
+            agent.search_root, agent.alpha_beta = recording_search_root, expiring_alpha_beta
+            cells = list(board.cells)
+            move = agent.make_move({'board': board, 'current_player': color})
+            assert [depth for depth, _ in completed] == [1, 2]
+            assert agent.completed_depth == 2
+            assert move == completed[-1][1] and board.is_empty(*move)
+            assert board.cells == cells
+
+
+def test_first_iteration_always_completes():
+    board = clustered_positions(1, min_stones=6, seed=5)[0]
+    agent = AlphaBetaAgent('black', time_limit=1e-6)
+    move = agent.make_move({'board': board, 'current_player': 'black'})
+    assert agent.completed_depth == 1 and board.is_empty(*move)
+
+
+@pytest.mark.parametrize('color', ['black', 'white'])
+def test_move_ordering_keeps_the_root_value(no_noise, color):
+    cutoffs = 0
+    for board in clustered_positions(6, min_stones=6, seed=6):
+        ordered = AlphaBetaAgent(color, depth=3, tt_bits=0)
+        assert search(ordered, board)[0] == search(AlphaBetaAgent(color, depth=3, tt_bits=0, move_ordering=False),
+                                                   board)[0]
+        cutoffs += ordered.cutoffs
+        # Every cutoff left its move as a killer of its ply and in the history of its side
+        killers = [move for slots in ordered.ordering.killers for move in slots if move is not None]
+        if ordered.cutoffs:
+            assert killers
+            for move in killers:
+                cell = move[0] * board.size + move[1]
+                assert ordered.ordering.history[BLACK][cell] + ordered.ordering.history[WHITE][cell] > 0
+    assert cutoffs > 0
+
+
+def test_cutoffs_record_killers_and_history():
+    ordering = MoveOrdering(size=15, max_ply=4)
+    moves = [(7, 7), (7, 8), (8, 8), (6, 6)]
+    ordering.record_cutoff((8, 8), 1, BLACK, 3)
+    ordering.record_cutoff((6, 6), 1, BLACK, 2)
+    ordering.record_cutoff((6, 6), 1, BLACK, 2)
+    assert ordering.killers[1] == [(6, 6), (8, 8)]
+    assert ordering.history[BLACK][6 * 15 + 6] == 8 and ordering.history[BLACK][8 * 15 + 8] == 9
+    assert ordering.history[WHITE][8 * 15 + 8] == 0
+    # The table move, the killers of the ply, the heuristic's top move, then the rest by history
+    assert ordering.order(moves, 1, BLACK, first=(7, 8)) == [(7, 8), (6, 6), (8, 8), (7, 7)]
+    assert ordering.order(moves, 2, BLACK) == [(7, 7), (8, 8), (6, 6), (7, 8)]
+    ordering.new_search()
+    assert ordering.killers[1] == [None, None] and ordering.history[BLACK][8 * 15 + 8] == 4
+
+
+def test_parallel_benchmark_compares_the_same_search():
+    # Raises when the parallel search plays a move of another score than the single process
+    result = parallel_speedup(2, depth=3, n=6)
+    assert result['cores'] == os.cpu_count() and result['positions'] == 6
@@ -0,0 +1,96 @@
+import random
+
+import pytest
+
+from src.Agents import AgentsUtils
+from src.Agents.IncrementalEvaluator import IncrementalEvaluator
+from src.Agents.expectimaxAgent import ExpectimaxAgent
+from positions import clustered_positions
+
+
+def reference_expectimax(board, color, depth, max_depth, maximizing):
+    """The search as first written: board copies, moves generated at every node, leaves by evaluation_state."""
+    legal_moves = AgentsUtils.mixed_heuristic(board, color, 5)
+    if depth == max_depth or not legal_moves:
+        return AgentsUtils.evaluation_state(board, color), (-1, -1)
+    other = "white" if color == "black" else "black"
+    values = []
+    for move in legal_moves:
+        child = board.copy()
+        child.make_move(move[0], move[1], color if maximizing else other)
+        values.append(reference_expectimax(child, color, depth + 1, max_depth, not maximizing)[0])
+    if maximizing:
+        best = max(range(len(values)), key=lambda i: (values[i], -i))  # First of the best, like max_evaluation
+        return values[best], legal_moves[best]
+    return sum(values) / len(values), (-1, -1)
+
+
+@pytest.fixture
+def no_noise(monkeypatch):
+    # The move lists are drawn with noise, the same lists make the searches comparable
+    monkeypatch.setattr(AgentsUtils, 'add_random_noise', int)
+
+
+@pytest.mark.parametrize('depth', [1, 2, 3])
+@pytest.mark.parametrize('color', ['black', 'white'])
+def test_search_matches_reference(no_noise, depth, color):
+    for board in clustered_positions(4, seed=depth):
+        agent = ExpectimaxAgent(color, depth=depth)
+        state = {'board': board.to_list(), 'current_player': color}
+        expected = reference_expectimax(board, color, 0, depth, True)
+        assert agent.make_move(state) == expected[1]
+
+
+
+@pytest.mark.parametrize('color', ['black', 'white'])
+def test_search_draws_the_reference_noise(color):
+    # Leaves skip their moves but not the noise, so a seeded search takes the same draws as the reference
+    for seed, board in enumerate(clustered_positions(4, seed=5)):
+        random.seed(seed)
+        expected = reference_expectimax(board, color, 0, 2, True)[1], random.random()
+        random.seed(seed)
+        agent = ExpectimaxAgent(color, depth=2)
+        assert (agent.make_move({'board': board.to_list(), 'current_player': color}), random.random()) == expected
+
+
+def search(agent, board):
+    """The root value and move of `agent`, the way make_move searches."""
+    board = board.copy()
+    agent.evaluator = IncrementalEvaluator(board)
+    try:
+        return agent.expectimax(0, board, True)
+    finally:
+        agent.evaluator = None
+
+
+@pytest.mark.parametrize('depth', [3, 4])
+@pytest.mark.parametrize('color', ['black', 'white'])
+def test_pruning_matches_full_search(no_noise, depth, color):
+    cutoffs = 0
+    for board in clustered_positions(6, min_stones=6, seed=depth):
+        pruned = ExpectimaxAgent(color, depth=depth, pruning=True)
+        assert search(pruned, board) == search(ExpectimaxAgent(color, depth=depth), board)
+        cutoffs += pruned.cutoffs
+    assert cutoffs > 0
+
+
+def test_evaluation_change_bounds_hold():
+    # Every placement of at most one stone of each colour, tracked incrementally
+    for color in ['black', 'white']:
+        other = 'white' if color == 'black' else 'black'
+        for board in clustered_positions(3, max_stones=20, seed=3, size=9):
+            evaluator = IncrementalEvaluator(board)
+            value = evaluator.evaluate(color)
+            lowest, highest = AgentsUtils.evaluation_change_bounds(board, color, 1, 1)
+            empty = [(row, col) for row in range(9) for col in range(9) if board.is_empty(row, col)]
+            for own in [None] + empty:
+                if own is not None:
+                    evaluator.push(*own, color)
+                for reply in [None] + empty:
+                    if reply is not None and reply != own:
+                        evaluator.push(*reply, other)
+                        assert lowest <= evaluator.evaluate(color) - value <= highest
+                        evaluator.pop()
+                assert lowest <= evaluator.evaluate(color) - value <= highest
+                if own is not None:
+                    evaluator.pop()
@@ -0,0 +1,27 @@
+import random
+
+from src.Agents.AgentsUtils import evaluation_state
+from src.Agents.IncrementalEvaluator import IncrementalEvaluator
+from positions import clustered_positions
+
+
+def check_scores(evaluator, board):
+    for color in ('black', 'white'):
+        assert evaluator.evaluate(color) == evaluation_state(board, color), (board, color)
+
+
+def test_push_and_pop_match_evaluation_state():
+    rng = random.Random(5)
+    for board in clustered_positions(20, max_stones=60, seed=4) + clustered_positions(3, seed=6, size=9):
+        evaluator = IncrementalEvaluator(board)
+        check_scores(evaluator, board)
+        moves = rng.sample(board.empty_cells(), min(12, board.size * board.size - board.stones))
+        for row, col in moves:
+            color = rng.choice(('black', 'white'))
+            board.make_move(row, col, color)
+            evaluator.push(row, col, color)
+            check_scores(evaluator, board)
+        for row, col in reversed(moves):
+            assert evaluator.pop() == row * board.size + col
+            board.undo_move(row, col)
+            check_scores(evaluator, board)
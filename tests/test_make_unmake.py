@@ -0,0 +1,80 @@
+import random
+
+import pytest
+
+from src.Agents import AgentsUtils
+from src.Agents.AlphaBetaAgent import AlphaBetaAgent
+from src.Agents.expectimaxAgent import ExpectimaxAgent
+from src.Agents.minimaxagent import MinimaxAgent
+from test_expectimax import reference_expectimax
+from positions import clustered_positions
+
+
+def other_color(color):
+    return "white" if color == "black" else "black"
+
+
+def reference_minimax(board, color, depth, max_depth, maximizing):
+    """Minimax as first written: a board copy per child, every empty cell a move, leaves by evaluation_state."""
+    legal_moves = board.empty_cells()
+    if depth == max_depth or not legal_moves:
+        return AgentsUtils.evaluation_state(board, color), (-1, -1)
+    best, best_move = None, (-1, -1)
+    for move in legal_moves:
+        child = board.copy()
+        child.make_move(move[0], move[1], color if maximizing else other_color(color))
+        value = reference_minimax(child, color, depth + 1, max_depth, not maximizing)[0]
+        if best is None or (value > best if maximizing else value < best):
+            best, best_move = value, move
+    return best, best_move
+
+
+def reference_alpha_beta(board, color, depth, max_depth, maximizing, alpha, beta):
+    """Alpha-beta as first written: a board copy per child, the top 5 `mixed_heuristic` moves, no table or ordering."""
+    if depth >= max_depth:
+        return AgentsUtils.evaluation_state(board, color), (-1, -1)
+    legal_moves = AgentsUtils.mixed_heuristic(board, color, 5)
+    if not legal_moves:
+        return AgentsUtils.evaluation_state(board, color), (-1, -1)
+    best, best_move = None, (-1, -1)
+    for move in legal_moves:
+        child = board.copy()
+        child.make_move(move[0], move[1], color if maximizing else other_color(color))
+        value = reference_alpha_beta(child, color, depth + 1, max_depth, not maximizing, alpha, beta)[0]
+        if best is None or (value > best if maximizing else value < best):
+            best, best_move = value, move
+        if maximizing:
+            alpha = max(alpha, value)
+        else:
+            beta = min(beta, value)
+        if beta <= alpha:
+            break
+    return best, best_move
+
+
+SEARCHES = {
+    'minimax': (lambda color: MinimaxAgent(color, depth=2),
+                lambda board, color: reference_minimax(board, color, 0, 2, True),
+                clustered_positions(3, min_stones=50, max_stones=70, seed=10, size=9)),
+    'alphabeta': (lambda color: AlphaBetaAgent(color, depth=3, tt_bits=0, move_ordering=False),
+                  lambda board, color: reference_alpha_beta(board, color, 0, 3, True, -float('inf'), float('inf')),
+                  clustered_positions(8, seed=10)),
+    'expectimax': (lambda color: ExpectimaxAgent(color, depth=2),
+                   lambda board, color: reference_expectimax(board, color, 0, 2, True),
+                   clustered_positions(8, seed=10)),
+}
+
+
+@pytest.mark.parametrize('color', ['black', 'white'])
+@pytest.mark.parametrize('name', list(SEARCHES))
+def test_search_matches_the_copy_based_search(name, color):
+    # Seeded like a game: the same moves, and the same draws of the move noise, leave the same random state behind
+    create_agent, reference, positions = SEARCHES[name]
+    for seed, board in enumerate(positions):
+        random.seed(seed)
+        expected = reference(board, color)[1], random.random()
+        random.seed(seed)
+        cells = list(board.cells)
+        move = create_agent(color).make_move({'board': board, 'current_player': color})
+        assert (move, random.random()) == expected, (name, seed)
+        assert board.cells == cells
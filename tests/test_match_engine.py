@@ -0,0 +1,17 @@
+from src.Agents.agentsFactory import AgentFactory
+from src.MatchEngine import play_games, play_games_parallel
+
+
+def test_parallel_batch_does_not_depend_on_workers():
+    # Both agents keep search state between moves: the transposition table and history, the reused tree
+    black = AgentFactory.create_agent('alphabeta', color='black', depth=2)
+    white = AgentFactory.create_agent('mcts', n_simulations=20, m_steps=4, rollout_policy='fast')
+    results = [play_games_parallel(black, white, n=4, workers=workers, seed=11)['games'] for workers in (1, 2)]
+    assert results[0] == results[1]
+
+
+def test_play_games_stops_the_agents_workers():
+    black = AgentFactory.create_agent('alphabeta', color='black', depth=2, workers=2)
+    white = AgentFactory.create_agent('mcts', n_simulations=20, m_steps=4, rollout_policy='fast', n_workers=2)
+    play_games(black, white, n=1, collect_data=False)
+    assert black._pool is None and white._pool is None
@@ -0,0 +1,201 @@
+import random
+
+import numpy as np
+import pytest
+
+from src.Agents.Frontier import Frontier
+from src.Agents.MCTSAgent import MCTSAgent, LEAST_RECENT, NO_NODE, ROOT_PARALLEL
+from src.Board import COLOR_CODES
+from positions import clustered_positions
+
+
+class ReferenceNode:
+    """A node of the object tree MCTSTree replaced, every node keeps its own board."""
+
+    def __init__(self, board, current_player, parent=None, move=None, untried_moves=(), terminal=False):
+        self.board = board
+        self.current_player = current_player
+        self.parent = parent
+        self.move = move
+        self.children = []
+        self.visits = 0
+        self.total_score = 0
+        self.terminal = terminal
+        self.untried_moves = list(untried_moves)
+
+    def best_child(self, exploration_weight, maximize):
+        sign = 1 if maximize else -1
+        return max(self.children, key=lambda child: sign * (child.total_score / child.visits) + exploration_weight * (
+            np.sqrt(np.log(self.visits) / child.visits)))
+
+    def expand(self, frontier):
+        move = self.untried_moves.pop()
+        next_board = self.board.copy()
+        next_board.make_move(move[0], move[1], self.current_player)
+        terminal = MCTSAgent._check_win_on_board(next_board, move[0], move[1], self.current_player)
+        frontier.push(move[0], move[1], self.current_player)
+        next_player = 'white' if self.current_player == 'black' else 'black'
+        child = ReferenceNode(next_board, next_player, self, move, [] if terminal else frontier.candidates(), terminal)
+        self.children.append(child)
+        return child
+
+
+def reference_search(agent, root, color, n_simulations):
+    """The simulations of the object tree, with the rollouts of `agent`."""
+    frontier = Frontier.from_board(root.board)
+    for _ in range(n_simulations):
+        node = root
+        while not node.untried_moves and node.children:
+            node = node.best_child(agent.exploration_weight, maximize=node.current_player == color)
+        path = []
+        step = node
+        while step.parent is not None:
+            path.append(step)
+            step = step.parent
+        for step in reversed(path):
+            frontier.push(step.move[0], step.move[1], step.parent.current_player)
+        if node.untried_moves:
+            node = node.expand(frontier)
+            path.append(node)
+        result = agent.rollout(node.board, node.current_player, color, node.terminal, frontier)
+        while node is not None:
+            node.visits += 1
+            node.total_score += result
+            node = node.parent
+        for _ in path:
+            frontier.pop()
+
+
+def check_same_tree(tree, node, reference):
+    """`node` of the MCTSTree and the reference node hold the same statistics, untried moves and children."""
+    size = tree.board_size
+    assert tree.visits[node] == reference.visits and tree.scores[node] == reference.total_score
+    assert tree.player[node] == COLOR_CODES[reference.current_player] and tree.terminal[node] == reference.terminal
+    assert tree.untried.get(node, []) == [row * size + col for row, col in reference.untried_moves]
+    children = tree.children(node)
+    assert [tree.move_of(child) for child in children] == [child.move for child in reference.children]
+    for child, reference_child in zip(children, reference.children):
+        check_same_tree(tree, child, reference_child)
+
+
+def check_tree(tree):
+    """Links, counters and untried moves of every node reachable from the root agree."""
+    reachable = [0]
+    for node in reachable:
+        children = tree.children(node)
+        assert len(children) == tree.child_count[node]
+        assert all(tree.parent[child] == node for child in children)
+        moves = [int(tree.move[child]) for child in children] + tree.untried.get(node, [])
+        assert len(set(moves)) == len(moves)
+        if node in tree.untried_priors:
+            assert len(tree.untried_priors[node]) == len(tree.untried[node])
+        reachable.extend(children)
+    assert len(reachable) == tree.size
+    assert not set(reachable) & set(tree.free) and tree.size + len(tree.free) == tree.used
+    assert tree.parent[tree.free].tolist() == [NO_NODE] * len(tree.free)
+    assert tree.untried_count == sum(len(moves) for moves in tree.untried.values())
+    assert tree.prior_count == sum(len(priors) for priors in tree.untried_priors.values())
+    assert tree.priors or not tree.untried_priors
+
+
+@pytest.mark.parametrize('settings', [{}, {'widening': True}, {'eviction': LEAST_RECENT, 'batch_size': 4}])
+def test_memory_budget_bounds_the_tree(settings):
+    random.seed(0)
+    board = clustered_positions(1, min_stones=12, max_stones=12, seed=3)[0]
+    budget = 100000
+    tree = MCTSAgent(m_steps=4, memory_budget=budget, **settings).search(board, 'black', 600)
+    assert tree.evicted > 0
+    assert tree.peak_memory <= budget
+    assert tree.size >= 20  # Evicts what does not fit, not the whole tree
+    check_tree(tree)
+
+
+def test_node_budget_bounds_the_tree():
+    random.seed(0)
+    board = clustered_positions(1, min_stones=12, max_stones=12, seed=3)[0]
+    tree = MCTSAgent(m_steps=4, node_budget=100).search(board, 'black', 600)
+    assert tree.evicted > 0 and tree.peak_size <= 100 and len(tree.visits) == 100
+    check_tree(tree)
+
+
+def test_memory_budget_too_small_for_the_root():
+    board = clustered_positions(1, seed=3)[0]
+    with pytest.raises(MemoryError):
+        MCTSAgent(memory_budget=1000).search(board, 'black', 10)
+
+
+def test_root_parallel_move_reports_the_worker_trees():
+    random.seed(0)
+    board = clustered_positions(1, min_stones=12, max_stones=12, seed=3)[0]
+    agent = MCTSAgent(m_steps=4, node_budget=50, n_workers=2, parallel_mode=ROOT_PARALLEL, n_simulations=400)
+    agent.peak_memory, agent.peak_nodes, agent.evicted_nodes = 10 ** 9, 10 ** 9, 10 ** 9  # Left by an earlier move
+    try:
+        agent.make_move({'board': board, 'current_player': 'black'})
+    finally:
+        agent.close()
+    stats = agent.search_stats()
+    assert 0 < stats['peak_nodes'] <= 2 * 50
+    assert 0 < stats['peak_memory'] < 10 ** 9
+    assert 0 < stats['evicted_nodes'] < 10 ** 9
+
+
+@pytest.mark.parametrize('color', ['black', 'white'])
+def test_tree_matches_the_node_tree(color):
+    agent = MCTSAgent(m_steps=2)
+    for seed, board in enumerate(clustered_positions(4, seed=12)):
+        random.seed(seed)
+        tree = agent.search(board, color, 150)
+        random.seed(seed)
+        root = ReferenceNode(board, color, untried_moves=Frontier.from_board(board).candidates())
+        reference_search(agent, root, color, 150)
+        check_same_tree(tree, 0, root)
+        check_tree(tree)
+
+
+def test_reused_tree_matches_the_node_tree():
+    board = clustered_positions(1, seed=13)[0]
+    agent = MCTSAgent(n_simulations=150, m_steps=2)
+    random.seed(1)
+    agent.make_move({'board': board, 'current_player': 'black'})
+    random.seed(1)
+    root = ReferenceNode(board, 'black', untried_moves=Frontier.from_board(board).candidates())
+    reference_search(agent, root, 'black', 150)
+
+    # The played move and the opponent's most visited reply become the root of the next search
+    played = max(root.children, key=lambda child: child.visits)
+    reply = max(played.children, key=lambda child: child.visits)
+    reply.parent = None
+    random.seed(2)
+    agent.make_move({'board': reply.board, 'current_player': 'black'})
+    random.seed(2)
+    reference_search(agent, reply, 'black', 150)
+    assert agent.reused_visits > 0
+    check_same_tree(agent.tree, 0, reply)
+
+
+def test_reused_tree_keeps_the_visit_clock():
+    random.seed(0)
+    board = clustered_positions(1, min_stones=12, max_stones=12, seed=3)[0]
+    agent = MCTSAgent(n_simulations=300, m_steps=2, node_budget=120, eviction=LEAST_RECENT)
+    agent.make_move({'board': board, 'current_player': 'black'})
+    old, played = agent.tree, agent.played
+    reply = max(old.children(played), key=lambda child: old.visits[child])
+    next_board = board.copy()
+    next_board.make_move(*old.move_of(played), 'black')
+    next_board.make_move(*old.move_of(reply), 'white')
+
+    tree = old.subtree(reply, next_board)
+    old_nodes, new_nodes = [reply], [0]  # Breadth first, the order subtree copies them in
+    for nodes, source in ((old_nodes, old), (new_nodes, tree)):
+        for node in nodes:
+            nodes.extend(source.children(node))
+    assert tree.clock == old.clock
+    assert tree.last_visit[new_nodes].tolist() == old.last_visit[old_nodes].tolist()
+
+    # The next search evicts the kept nodes it does not revisit before the ones of its own simulations
+    agent.make_move({'board': next_board, 'current_player': 'black'})
+    tree = agent.tree
+    assert agent.reused_visits > 0 and tree.evicted > 0 and tree.clock == old.clock + 300
+    check_tree(tree)
+    assert tree.last_visit[0] == tree.clock
+    assert tree.last_visit[:tree.used].max() <= tree.clock
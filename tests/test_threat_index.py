@@ -0,0 +1,39 @@
+import random
+from collections import Counter
+
+from src.MatchEngine import MatchEngine
+from src.ThreatIndex import ThreatIndex
+from positions import clustered_positions
+
+
+def check_spots(index, board):
+    """Win spots of both colours against the full-board scan, a spot counts once per window it completes."""
+    engine = MatchEngine(None, None, collect_data=False, board_size=board.size)
+    engine.board = board
+    fours = 0
+    for color in ('black', 'white'):
+        expected = Counter(engine.find_potential_win_spots(color))
+        assert Counter(index.win_spots(color)) == expected, (board, color)
+        assert index.has_four(color) == bool(expected)
+        fours += len(expected)
+    return fours
+
+
+def test_push_and_pop_match_the_board_scan():
+    rng = random.Random(7)
+    fours = 0
+    for board in clustered_positions(20, min_stones=20, max_stones=90, seed=8) + \
+            clustered_positions(3, max_stones=50, seed=9, size=9):
+        index = ThreatIndex.from_board(board)
+        fours += check_spots(index, board)
+        moves = rng.sample(board.empty_cells(), min(10, board.size * board.size - board.stones))
+        for row, col in moves:
+            color = rng.choice(('black', 'white'))
+            board.make_move(row, col, color)
+            index.push(row, col, color)
+            fours += check_spots(index, board)
+        for row, col in reversed(moves):
+            index.pop()
+            board.undo_move(row, col)
+            fours += check_spots(index, board)
+    assert fours > 0  # The positions do have fours to find
@@ -0,0 +1,65 @@
+import pytest
+
+from src.Agents.ThreatSearch import ThreatSearch, VCF, VCT, WIN, NO_WIN
+from src.Board import Board
+from positions import clustered_positions
+
+
+def position(black, white):
+    board = Board()
+    for row, col in black:
+        board.make_move(row, col, 'black')
+    for row, col in white:
+        board.make_move(row, col, 'white')
+    return board
+
+
+# Black to move, white has no threat of its own
+OPEN_THREE = position([(7, 5), (7, 6), (7, 7)], [(3, 3), (10, 12)])
+FOUR_THREE = position([(7, 4), (7, 5), (7, 6), (5, 8), (6, 8)], [(7, 3), (2, 2), (12, 12), (3, 11)])
+DOUBLE_THREE = position([(7, 5), (7, 6), (5, 8), (6, 8)], [(2, 2), (12, 12), (3, 11)])
+CLOSED_THREE = position([(7, 5), (7, 6), (7, 7)], [(7, 4), (10, 12)])
+
+
+@pytest.mark.parametrize('mode', [VCF, VCT])
+def test_open_four_wins(mode):
+    search = ThreatSearch(mode)
+    assert search.find_win(OPEN_THREE, 'black') in [(7, 4), (7, 8)]
+    assert search.status == WIN and len(search.line) == 1
+
+
+@pytest.mark.parametrize('mode', [VCF, VCT])
+def test_four_three_wins(mode):
+    search = ThreatSearch(mode)
+    assert search.find_win(FOUR_THREE, 'black') == (7, 8)
+    # The four is forced to be blocked, then the three becomes an open four
+    assert search.status == WIN and search.line[:2] == [(7, 8), (7, 7)] and search.line[2] in [(4, 8), (8, 8)]
+
+
+def test_double_three_wins_by_threes_only():
+    search = ThreatSearch(VCF)
+    assert search.find_win(DOUBLE_THREE, 'black') is None
+    assert search.status == NO_WIN
+    search = ThreatSearch(VCT)
+    assert search.find_win(DOUBLE_THREE, 'black') == (7, 8)
+    assert search.status == WIN
+
+
+@pytest.mark.parametrize('mode', [VCF, VCT])
+def test_blocked_three_is_refuted(mode):
+    search = ThreatSearch(mode)
+    assert search.find_win(CLOSED_THREE, 'black') is None
+    assert search.status == NO_WIN
+    assert search.find_win(CLOSED_THREE, 'white') is None
+
+
+def test_deeper_limit_finds_the_same_win():
+    # Without iterative deepening, a depth 30 search ran out of nodes on long threat sequences first
+    board = clustered_positions(12, min_stones=10, max_stones=40, seed=11)[11]
+    lines = []
+    for max_depth in (9, 30):
+        search = ThreatSearch(VCT, max_depth=max_depth)
+        assert search.find_win(board, 'black') is not None
+        assert search.status == WIN
+        lines.append(search.line)
+    assert lines[0] == lines[1]
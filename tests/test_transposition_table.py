@@ -0,0 +1,61 @@
+import pytest
+
+from src.Agents import AgentsUtils
+from src.Agents.AlphaBetaAgent import AlphaBetaAgent
+from src.Agents.TranspositionTable import TranspositionTable, EXACT, LOWER_BOUND, UPPER_BOUND, SIDE_TO_MOVE_KEY
+from test_alphabeta import search
+from positions import clustered_positions
+
+
+@pytest.fixture
+def no_noise(monkeypatch):
+    # The move lists are drawn with noise, the same lists make the searches comparable
+    monkeypatch.setattr(AgentsUtils, 'add_random_noise', int)
+
+
+def test_store_and_probe():
+    table = TranspositionTable(4)
+    table.store(0x35, 3, EXACT, 120, (7, 7))
+    assert table.probe(0x35) == (0x35, 3, EXACT, 120, (7, 7), 0)
+    assert table.probe(0x25) is None  # Same slot, another position
+    assert table.probe(0x36) is None
+    assert (table.hits, table.misses, table.stores) == (1, 2, 1)
+
+
+def test_replacement_prefers_depth_within_a_search():
+    table = TranspositionTable(4)
+    table.store(0x35, 4, LOWER_BOUND, 50, (7, 7))
+    table.store(0x25, 2, EXACT, 10, (6, 6))  # Shallower, keeps the deeper entry of this search
+    assert table.probe(0x35) is not None and table.probe(0x25) is None
+    table.store(0x35, 1, UPPER_BOUND, 30, (8, 8))  # The same position always replaces its entry
+    assert table.probe(0x35)[1:5] == (1, UPPER_BOUND, 30, (8, 8))
+    table.store(0x35, 4, EXACT, 40, (7, 7))
+    table.new_search()
+    table.store(0x25, 2, EXACT, 10, (6, 6))  # Entries of an older search give way to any depth
+    assert table.probe(0x35) is None and table.probe(0x25) == (0x25, 2, EXACT, 10, (6, 6), 1)
+
+
+def test_side_to_move_has_its_own_entries(no_noise):
+    board = clustered_positions(1, min_stones=8, seed=7)[0]
+    agent = AlphaBetaAgent('black', depth=2, tt_bits=16)
+    score, move = search(agent, board)
+    table = agent.transposition_table
+    # The root, black to move, is stored under the board key
+    assert table.probe(board.key)[1:] == (2, EXACT, score, move, 0)
+    # After black's move white is to move, stored under the key xor SIDE_TO_MOVE_KEY
+    child = board.copy()
+    child.make_move(*move, 'black')
+    assert table.probe(child.key ^ SIDE_TO_MOVE_KEY)[1] == 1
+    assert table.probe(child.key) is None
+
+
+@pytest.mark.parametrize('move_ordering', [False, True])
+@pytest.mark.parametrize('color', ['black', 'white'])
+def test_table_keeps_the_root_value(no_noise, color, move_ordering):
+    hits = 0
+    for board in clustered_positions(6, min_stones=6, seed=8):
+        cached = AlphaBetaAgent(color, depth=3, tt_bits=16, move_ordering=move_ordering)
+        expected = search(AlphaBetaAgent(color, depth=3, tt_bits=0, move_ordering=move_ordering), board)[0]
+        assert search(cached, board)[0] == expected
+        hits += cached.transposition_table.hits
+    assert hits > 0